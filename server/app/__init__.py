@@ -4,6 +4,12 @@ from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
+from app.tmdb_api import TMDb
+from app.compression import Compress
+from app.ratelimit import RateLimiter
+from app.passwords import PasswordHasher
+from app.usercache import UserCache
+from app.contact.email import Mail
 import logging
 from logging.handlers import RotatingFileHandler
 
@@ -16,6 +22,18 @@ migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 
+tmdb = TMDb()
+
+compress = Compress()
+
+limiter = RateLimiter()
+
+hasher = PasswordHasher()
+
+user_cache = UserCache()
+
+mail = Mail()
+
 
 def create_app(config=Config):
     # Set a writable instance path
@@ -31,6 +49,12 @@ def create_app(config=Config):
     db.init_app(flask_app)
     migrate.init_app(flask_app, db)
     login_manager.init_app(flask_app)    
+    tmdb.init_app(flask_app)
+    compress.init_app(flask_app)
+    limiter.init_app(flask_app)
+    hasher.init_app(flask_app)
+    user_cache.init_app(flask_app)
+    mail.init_app(flask_app)
 
     # Initialize CORS with your frontend URL
     CORS(flask_app, resources={r"/*": {"origins": flask_app.config["FRONTEND_ENDPOINT"], "supports_credentials": True}})
@@ -63,6 +87,18 @@ def create_app(config=Config):
     from app.contact import bp as contact_bp
     flask_app.register_blueprint(contact_bp, url_prefix="/api")
 
+    # Register the library blueprint
+    from app.library import bp as library_bp
+    flask_app.register_blueprint(library_bp, url_prefix="/api")
+
+    # Register the metrics blueprint
+    from app.metrics import bp as metrics_bp
+    flask_app.register_blueprint(metrics_bp, url_prefix="/api")
+
+    # Register the search index commands
+    from app.tmdb_api.search_index import search_index_cli
+    flask_app.cli.add_command(search_index_cli)
+
     # @flask_app.before_request
     # def list_routes():
     #     """Print out all registered routes."""
@@ -2,15 +2,10 @@ from flask import jsonify, abort
 from flask_login import current_user
 from sqlalchemy.exc import SQLAlchemyError
 
-from app import db, login_manager
+from app import db
 from app.account import bp
 from app.models import User, MovieState, TVShowState
 
-@login_manager.user_loader  # Reload a user object based on the user ID stored in the session.
-def load_user(user_id):
-    user = db.get_or_404(User, user_id)
-    return user
-
 @bp.route('/delete-account', methods=['DELETE'])
 def delete_account():
     if not current_user.is_authenticated:
@@ -1,11 +1,11 @@
 import secrets
 from flask import jsonify, request, make_response, session
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 
-from app import db, login_manager
+from app import db, hasher, login_manager, user_cache
 from app.auth import bp
 from app.models import User
+from app.passwords import HasherBusy
 
 def generate_secure_session_id():
     # Generate a 64-bit (16-byte) random session ID
@@ -14,8 +14,8 @@ def generate_secure_session_id():
 
 @login_manager.user_loader  # Reload a user object based on the user ID stored in the session.
 def load_user(user_id):
-    user = db.get_or_404(User, user_id)
-    return user
+    # Served from memory; the users table is only read on a cache miss.
+    return user_cache.load(user_id)
 
 @bp.route('/check-session', methods=['GET'])
 def check_session():
@@ -48,7 +48,8 @@ def register():
         return jsonify({"message": "Email already registered"}), 400
 
     try:
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256', salt_length=8)
+        # Hashing runs on its own bounded pool, so a burst of sign-ups cannot take every worker's CPU.
+        hashed_password = hasher.hash(password)
         new_user = User(
             username=username,
             email=email,
@@ -64,6 +65,8 @@ def register():
 
         response = make_response(jsonify({"session_id": session_id, "username": new_user.username, "id": new_user.id}))
         return response, 201
+    except HasherBusy:
+        return busy_response()
     except Exception as e:
         print(f"Error during registration: {e}")
         return jsonify({"message": "Server error during registration"}), 500    
@@ -90,9 +93,16 @@ def login():
     if not user:
         return jsonify({"message": "User does not exist"}), 401
 
-    if not check_password_hash(user.password, password):        
-        return jsonify({"message": "Invalid password"}), 401
-    
+    try:
+        if not hasher.verify(user.password, password):
+            return jsonify({"message": "Invalid password"}), 401
+
+        # Bring hashes made with older parameters up to the configured ones while we have the password.
+        if hasher.upgrade(user, password):
+            db.session.commit()
+    except HasherBusy:
+        return busy_response()
+
     login_user(user, remember=True)
 
     # Generate a secure session ID for this user and store session details on the server
@@ -102,6 +112,11 @@ def login():
     response = jsonify({"session_id": session_id, "username": user.username, "id": user.id})
     return response, 200
 
+def busy_response():
+    response = jsonify({"message": "Too many sign-in attempts in progress, please try again"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @bp.route('/logout', methods=['POST'])
 @login_required
 def logout():
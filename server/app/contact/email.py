@@ -1,34 +1,199 @@
+import atexit
+import logging
+import queue
 import smtplib
-from threading import Thread
+import threading
 from email.mime.text import MIMEText
 
-from config import Config
+from flask import current_app
 
-def _email(name, from_addr, message):
-    # Constructing the email message.
-    msg = f"Subject: New Message\n\nName: {name}\nEmail: {from_addr}\nMessage: {message}"
-    mime_message = MIMEText(msg, 'plain', 'utf-8')
+logger = logging.getLogger(__name__)
+
+# Put on the queue to stop the worker once the messages ahead of it are sent.
+_STOP = object()
+
+
+class MailQueueFull(Exception):
+    """Raised when the mail queue stays full for longer than the enqueue timeout."""
+
+
+class MailQueue:
+    """Bounded in-process queue of outgoing mail, delivered by one long-lived worker thread.
+
+    The worker keeps a single SMTP connection open (STARTTLS and login happen
+    once per connection, not per message) and sends whatever has queued up in
+    batches of up to `batch_size`. The connection is closed after
+    `idle_timeout` seconds without mail and reopened when the server drops
+    it. When `queue_size` messages are waiting, `put` blocks for up to
+    `enqueue_timeout` seconds and then raises MailQueueFull, so a burst of
+    contact requests cannot grow memory or connections without bound.
+
+    A server that does not offer STARTTLS fails delivery while `use_tls` is
+    set, rather than being sent the password in the clear.
+    """
+
+    def __init__(self, server, port, use_tls=True, username=None, password=None, queue_size=100, batch_size=20,
+                 enqueue_timeout=0.5, idle_timeout=30, timeout=10):
+        self.server = server
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.batch_size = batch_size
+        self.enqueue_timeout = enqueue_timeout
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.sent = 0
+        self.failed = 0
+        self.rejected = 0
+        self.connections = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._connection = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def put(self, from_addr, to_addrs, message):
+        self._ensure_worker()
+        try:
+            self._queue.put((from_addr, to_addrs, message), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.rejected += 1
+            raise MailQueueFull()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "connections": self.connections,
+        }
+
+    def close(self, timeout=10):
+        """Stop the worker after it has sent what is already queued."""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(_STOP)
+            worker.join(timeout)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                # Flush queued mail when the process exits normally.
+                atexit.register(self.close)
+            elif self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+            self._worker.start()
 
-    # print(f"Connecting to {Config.MAIL_SERVER} on port {Config.MAIL_PORT} with TLS: {Config.MAIL_USE_TLS}")
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._disconnect()
+                continue
 
-    # Open a connection to the email server.
-    with smtplib.SMTP(Config.MAIL_SERVER, Config.MAIL_PORT) as connection:        
-        connection.starttls()  # Initiate a secure connection.
-        connection.login(Config.RECIPIENT_EMAIL, Config.EMAIL_PASSWORD)  # Log in to the email server.
-        connection.sendmail(
-            from_addr=from_addr, 
-            to_addrs=Config.RECIPIENT_EMAIL, 
-            msg=mime_message.as_string()
+            batch = [item]
+            while item is not _STOP and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            for item in batch:
+                if item is _STOP:
+                    self._disconnect()
+                    return
+                try:
+                    self._deliver(*item)
+                except Exception:
+                    # A malformed message must not take the only worker down with it.
+                    logger.exception("Sending mail failed")
+                    self._disconnect()
+                    self.failed += 1
+
+    def _deliver(self, from_addr, to_addrs, message):
+        # A reused connection may have been dropped by the server; reconnect once before giving up.
+        for attempt in range(2):
+            try:
+                self._connect().sendmail(from_addr, to_addrs, message)
+                self.sent += 1
+                return
+            except smtplib.SMTPServerDisconnected as e:
+                self._disconnect()
+                if attempt:
+                    logger.error("Sending mail failed: %s", e)
+            except smtplib.SMTPException as e:
+                # Refused by the server (recipients, data or login); trying again would not help.
+                logger.error("Mail was rejected: %s", e)
+                break
+            except OSError as e:
+                self._disconnect()
+                if attempt:
+                    logger.error("Sending mail failed: %s", e)
+        self.failed += 1
+
+    def _connect(self):
+        if self._connection is None:
+            connection = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+            try:
+                if self.use_tls:
+                    connection.starttls()  # Initiate a secure connection.
+                if self.password:
+                    connection.login(self.username, self.password)  # Log in to the email server.
+            except BaseException:
+                connection.close()
+                raise
+            self._connection = connection
+            self.connections += 1
+        return self._connection
+
+    def _disconnect(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except (smtplib.SMTPException, OSError):
+            self._connection.close()
+        self._connection = None
+
+
+class Mail:
+    """Flask extension owning the app's mail queue."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["mail_queue"] = MailQueue(
+            server=app.config["MAIL_SERVER"],
+            port=app.config["MAIL_PORT"],
+            use_tls=app.config["MAIL_USE_TLS"],
+            username=app.config["RECIPIENT_EMAIL"],
+            password=app.config["EMAIL_PASSWORD"],
+            queue_size=app.config["MAIL_QUEUE_SIZE"],
+            batch_size=app.config["MAIL_BATCH_SIZE"],
+            enqueue_timeout=app.config["MAIL_ENQUEUE_TIMEOUT"],
+            idle_timeout=app.config["MAIL_IDLE_TIMEOUT"],
         )
 
-def send_email(name, from_addr, message):
-    thread = Thread(
-        target=_email,
-        args=(name, from_addr, message)
-    )
-    thread.start()
+    @property
+    def queue(self):
+        return current_app.extensions["mail_queue"]
+
+    def stats(self):
+        return self.queue.stats()
 
 
-# Example usage:
-# You need to call send_email with appropriate parameters, such as sender's name, email, and message.
-# The sender's email address should be provided as from_addr.
\ No newline at end of file
+def send_email(name, from_addr, message):
+    """Queue a contact form message for delivery. Raises MailQueueFull when the queue is backed up."""
+    # Constructing the email message.
+    msg = f"Subject: New Message\n\nName: {name}\nEmail: {from_addr}\nMessage: {message}"
+    mime_message = MIMEText(msg, 'plain', 'utf-8')
+
+    recipient = current_app.config["RECIPIENT_EMAIL"]
+    current_app.extensions["mail_queue"].put(from_addr, recipient, mime_message.as_string())
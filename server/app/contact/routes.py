@@ -1,20 +1,32 @@
 from flask import request, jsonify
 
 from app.contact import bp
-from app.contact.email import send_email
+from app.contact.email import MailQueueFull, send_email
 
 @bp.route('/contact', methods=['POST'])
 def contact():
     try:
         # Extract data from the request
-        data = request.json        
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"message": "Invalid data"}), 400
         name = data.get('name')
         email = data.get('email')
         message = data.get('message')
 
-        # Send the email
+        if not all(isinstance(field, str) and field.strip() for field in (name, email, message)):
+            return jsonify({"message": "Name, email and message are required"}), 400
+        # The address becomes the envelope sender, so it must at least look like one.
+        if '@' not in email or any(char.isspace() for char in email):
+            return jsonify({"message": "Invalid email address"}), 400
+
+        # Queue the email; it is delivered in the background over a shared SMTP connection
         send_email(name, email, message)
 
         return jsonify({"message": "Email send successfully"}), 200
+    except MailQueueFull:
+        response = jsonify({"error": "Too many messages are waiting to be sent, please try again later"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
     except Exception as e:
         return jsonify({f'error: {str(e)}'}), 500
\ No newline at end of file
@@ -0,0 +1,34 @@
+from functools import wraps
+
+from flask import make_response, request
+
+from app import db
+from app.models import User
+
+
+def state_etag(user_id):
+    version = db.session.execute(db.select(User.state_version).where(User.id == user_id)).scalar()
+    return None if version is None else f'{user_id}-{version}'
+
+
+def conditional_on_state_version(view):
+    """Serve a per-user state view conditionally, using the user's state version as its ETag.
+
+    A matching If-None-Match is answered with 304 straight from the users table,
+    without running the view's queries against the state tables.
+    """
+    @wraps(view)
+    def wrapper(user_id, *args, **kwargs):
+        etag = state_etag(user_id)
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(user_id, *args, **kwargs))
+            if etag is None or response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        # Let browsers keep the copy but always revalidate it.
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
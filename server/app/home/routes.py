@@ -1,8 +1,8 @@
-import requests
-from flask import jsonify, request
+from flask import request
 
+from app import tmdb
+from app.tmdb_api import LIST_TTL, NOW_PLAYING_MAX_STALE
 from app.home import bp
-from config import Config
 
 @bp.route('/', methods=['GET'])
 def success_endpoint():
@@ -10,69 +10,47 @@ def success_endpoint():
 
 @bp.route('/home/in-theatres', methods=['GET'])    
 def get_currently_in_theatres():
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = "https://api.themoviedb.org/3/movie/now_playing"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
+    path = "/movie/now_playing"
     
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=params, ttl=LIST_TTL, max_stale=NOW_PLAYING_MAX_STALE, fields=request.args.get('fields'))
     
 @bp.route('/home/show-top-rated', methods=['GET'])    
 def get_top_rated_shows():
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = "https://api.themoviedb.org/3/tv/top_rated"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
+    path = "/tv/top_rated"
     
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=params, ttl=LIST_TTL, fields=request.args.get('fields'))
     
 @bp.route('/home/movie-top-rated', methods=['GET'])    
 def get_top_rated_movies():
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = "https://api.themoviedb.org/3/movie/top_rated"
+    path = "/movie/top_rated"
     
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
+    return tmdb.proxy(path, params=params, ttl=LIST_TTL, fields=request.args.get('fields'))
+
+@bp.route('/home/overview', methods=['GET'])
+def get_home_overview():
+    # Everything the home page needs in one request; the upstream calls run concurrently.
+    params = {
+        "language": request.args.get('language', 'en-US'),
+        "page": request.args.get('page', 1),
     }
-    
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
\ No newline at end of file
+
+    return tmdb.proxy_many(fields=request.args.get('fields'), sections={
+        "in_theatres": {"path": "/movie/now_playing", "params": params, "ttl": LIST_TTL, "max_stale": NOW_PLAYING_MAX_STALE},
+        "show_top_rated": {"path": "/tv/top_rated", "params": params, "ttl": LIST_TTL},
+        "movie_top_rated": {"path": "/movie/top_rated", "params": params, "ttl": LIST_TTL},
+    })
@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+bp = Blueprint('library', __name__)
+
+from app.library import routes
\ No newline at end of file
@@ -0,0 +1,114 @@
+from flask import current_app, jsonify, request
+from sqlalchemy import literal, union_all
+
+from app import db
+from app.library import bp
+from app.etag import conditional_on_state_version
+from app.models import MovieState, TVShowState, WATCHLIST_STATES, bump_state_version, upsert_states
+
+# Model and title id column for each kind of item accepted by the library endpoints.
+KINDS = {
+    'movie': (MovieState, 'movie_id'),
+    'tv': (TVShowState, 'tv_show_id'),
+}
+
+# Key of each kind in the library document.
+SECTIONS = {
+    'movie': 'movies',
+    'tv': 'tv_shows',
+}
+
+@bp.route('/library/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
+def get_library(user_id):
+    # Read both state tables in a single round trip and group the rows here.
+    query = union_all(*[
+        db.select(
+            literal(kind).label('kind'),
+            model.id,
+            getattr(model, title_column).label('title_id'),
+            model.state,
+            model.title,
+            model.image_path
+        ).where(model.user_id == user_id)
+        for kind, (model, title_column) in KINDS.items()
+    ]).order_by('kind', 'id')
+
+    try:
+        rows = db.session.execute(query).all()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    library = {section: {state: [] for state in WATCHLIST_STATES} for section in SECTIONS.values()}
+    for row in rows:
+        _, title_column = KINDS[row.kind]
+        library[SECTIONS[row.kind]].setdefault(row.state, []).append({
+            'id': row.id,
+            'user_id': user_id,
+            title_column: row.title_id,
+            'state': row.state,
+            'title': row.title,
+            'image_path': row.image_path
+        })
+
+    counts = {
+        section: {state: len(items) for state, items in states.items()}
+        for section, states in library.items()
+    }
+    counts['total'] = len(rows)
+
+    return jsonify({**library, 'counts': counts}), 200
+
+@bp.route('/library/states', methods=['POST'])
+def set_states():
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id')
+    items = data.get('items')
+
+    if not user_id or not isinstance(items, list) or not items:
+        return jsonify({'error': 'Missing required parameters'}), 400
+
+    max_items = current_app.config['LIBRARY_BATCH_MAX_ITEMS']
+    if len(items) > max_items:
+        return jsonify({'error': f'A batch may contain at most {max_items} items'}), 400
+
+    results = []
+    rows = {kind: {} for kind in KINDS}
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        kind, title_id, state = item.get('kind'), item.get('id'), item.get('state')
+        result = {'index': index, 'kind': kind, 'id': title_id}
+        results.append(result)
+
+        if kind not in KINDS:
+            result.update(status='error', error='Invalid kind')
+        elif not isinstance(title_id, int) or isinstance(title_id, bool):
+            result.update(status='error', error='Invalid id')
+        elif state not in WATCHLIST_STATES:
+            result.update(status='error', error='Invalid state')
+        else:
+            # A title may only be written once per statement; the last occurrence wins.
+            previous = rows[kind].pop(title_id, None)
+            if previous is not None:
+                results[previous[0]].update(status='superseded')
+            _, title_column = KINDS[kind]
+            rows[kind][title_id] = (index, {
+                'user_id': user_id,
+                title_column: title_id,
+                'state': state,
+                'title': item.get('title'),
+                'image_path': item.get('image')
+            })
+            result['status'] = 'ok'
+
+    try:
+        for kind, (model, title_column) in KINDS.items():
+            if rows[kind]:
+                upsert_states(model, title_column, [row for _, row in rows[kind].values()])
+        bump_state_version(user_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({'results': results}), 200
@@ -0,0 +1,28 @@
+import hmac
+
+from flask import abort, current_app, jsonify, request
+
+from app import hasher, limiter, mail, tmdb, user_cache
+from app.metrics import bp
+from app.schema import check_schema_version
+
+@bp.before_request
+def require_metrics_token():
+    # Metrics expose cache keys and internal state; without a configured token the endpoint does not exist.
+    token = current_app.config["METRICS_TOKEN"]
+    if not token:
+        abort(404)
+    # Compare bytes: compare_digest raises on str arguments holding non-ASCII characters.
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+        return jsonify({"error": "Unauthorized"}), 401
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        "tmdb": tmdb.stats(),
+        "rate_limit": limiter.stats(),
+        "password_hashing": hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "mail": mail.stats(),
+        "schema": check_schema_version(),
+    }), 200
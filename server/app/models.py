@@ -1,22 +1,32 @@
 from flask_login import UserMixin
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, ForeignKey
+from sqlalchemy import Integer, String, ForeignKey, Index, UniqueConstraint, func
+from sqlalchemy.dialects import postgresql, sqlite
 
 from app import db
 
+# States a movie or TV show can have in a user's watchlist.
+WATCHLIST_STATES = ('Completed', 'Watching', 'Plan to Watch', 'On Hold', 'Dropped')
+
 class User(UserMixin, db.Model):
     __tablename__ = "users"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     username: Mapped[str] = mapped_column(String(100))
     email: Mapped[str] = mapped_column(String(100), unique=True)
-    password: Mapped[str] = mapped_column(String(100))
+    password: Mapped[str] = mapped_column(String(255))
+    # Bumped on every watchlist write; used as the ETag of the user's state endpoints.
+    state_version: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
 
     def __repr__(self):
         return f'{self.username}' 
     
 class MovieState(db.Model):
     __tablename__ = 'movie_states'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'movie_id', name='uq_movie_states_user_id_movie_id'),  # Also serves lookups by user_id
+        Index('ix_movie_states_user_id_state_id', 'user_id', 'state', 'id'),  # Watchlist queries and pages
+    )
 
     id = mapped_column(Integer, primary_key=True)
     user_id = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
@@ -33,6 +43,10 @@ class MovieState(db.Model):
     
 class TVShowState(db.Model):
     __tablename__ = 'tv_show_states'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'tv_show_id', name='uq_tv_show_states_user_id_tv_show_id'),  # Also serves lookups by user_id
+        Index('ix_tv_show_states_user_id_state_id', 'user_id', 'state', 'id'),  # Watchlist queries and pages
+    )
 
     id = mapped_column(Integer, primary_key=True)
     user_id = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
@@ -45,4 +59,36 @@ class TVShowState(db.Model):
     user = relationship('User', backref='tv_show_states')
 
     def __repr__(self):
-        return f'{self.user_id} - {self.tv_show_id} - {self.title} - {self.image_path} - {self.state}'    
\ No newline at end of file
+        return f'{self.user_id} - {self.tv_show_id} - {self.title} - {self.image_path} - {self.state}'
+
+def upsert_states(model, title_column, rows):
+    """Insert or update watchlist states with one INSERT ... ON CONFLICT DO UPDATE statement.
+
+    `rows` are dicts with user_id, the title id column, state, title and image_path.
+    Relies on the (user_id, title id) unique constraint; title and image_path keep
+    their stored values when a row leaves them empty.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(model)
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(model)
+    else:
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+    stmt = stmt.values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', title_column],
+        set_={
+            'state': stmt.excluded.state,
+            'title': func.coalesce(stmt.excluded.title, model.title),
+            'image_path': func.coalesce(stmt.excluded.image_path, model.image_path),
+        }
+    )
+    db.session.execute(stmt)
+
+def bump_state_version(user_id):
+    """Mark the user's watchlist as changed, in the same transaction as the write."""
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(state_version=User.state_version + 1)
+    )
@@ -1,15 +1,15 @@
-import requests
 from flask import jsonify, request
 from urllib.parse import unquote
 
-from app import db
+from app import db, tmdb
+from app.tmdb_api import DETAIL_TTL, LIST_TTL, MOVIE_APPENDABLE, SEARCH_TIMEOUT, TRENDING_TTL, TRENDING_MAX_STALE, append_to_response
 from app.movie import bp
-from config import Config
-from app.models import MovieState
+from app.etag import conditional_on_state_version
+from app.models import MovieState, bump_state_version, upsert_states
+from app.pagination import InvalidCursor, keyset_page, wants_page
 
 @bp.route('/movies/popular', methods=['GET'])
 def get_popular_movies():
-    token = Config.ACCESS_TOKEN
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
@@ -28,49 +28,26 @@ def get_popular_movies():
     if release_date_lte:
         params["release_date.lte"] = release_date_lte
     
-    url = "https://api.themoviedb.org/3/discover/movie"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    path = "/discover/movie"
     
     # Filter out None values from params
     filtered_params = {k: v for k, v in params.items() if v is not None}
     
-    response = requests.get(url, headers=headers, params=filtered_params)
-    
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=filtered_params, ttl=LIST_TTL, fields=request.args.get('fields'))
 
 @bp.route('/movies/trending', methods=['GET'])    
 def get_trending_movies():
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = "https://api.themoviedb.org/3/trending/movie/day"
+    path = "/trending/movie/day"
     
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=params, ttl=TRENDING_TTL, max_stale=TRENDING_MAX_STALE, fields=request.args.get('fields'))
 
 @bp.route('/movies/top-rated', methods=['GET'])
 def get_top_rated_movies():
-    token = Config.ACCESS_TOKEN
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
@@ -97,27 +74,15 @@ def get_top_rated_movies():
     if vote_count_lte:
         params["vote_count.lte"] = vote_count_lte
     
-    url = "https://api.themoviedb.org/3/discover/movie"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    path = "/discover/movie"
     
     # Filter out None values from params
     filtered_params = {k: v for k, v in params.items() if v is not None and v != ''}        
     
-    response = requests.get(url, headers=headers, params=filtered_params)
-    
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        print("Error Response:", response.json())
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=filtered_params, ttl=LIST_TTL, fields=request.args.get('fields'))
 
 @bp.route('/movies/upcoming', methods=['GET'])
 def get_upcoming_movies():
-    token = Config.ACCESS_TOKEN
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
@@ -129,67 +94,37 @@ def get_upcoming_movies():
         "release_date.lte": request.args.get('release_date_lte', None)
     }
     
-    url = "https://api.themoviedb.org/3/discover/movie"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params={k: v for k, v in params.items() if v is not None})
+    path = "/discover/movie"
     
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code 
+    return tmdb.proxy(path, params={k: v for k, v in params.items() if v is not None}, ttl=LIST_TTL, fields=request.args.get('fields'))
 
 @bp.route("/movies/search", methods=["GET"])
 def search():
-    token = Config.ACCESS_TOKEN
-
     params = {
         "query": request.args.get("query", ""),
         "page": request.args.get('page', 1),
         "include_adult": request.args.get('include_adult', 'true'),
     }
 
-    url = "https://api.themoviedb.org/3/search/movie"
-
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-
-    response = requests.get(url, headers=headers, params=params)
+    path = "/search/movie"
 
-    if response.status_code == 200:
-        json_data = response.json()
-        return jsonify(json_data)  # Return only the 'results' array
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.search("movie", path, params, fields=request.args.get('fields'), timeout=SEARCH_TIMEOUT)
 
 @bp.route('/movies/<int:movie_id>', methods=['GET'])
 def get_movie_details(movie_id):
-    token = Config.ACCESS_TOKEN
-
     params = {
         "language": request.args.get('language', 'en-US'),
     }
 
-    url = f'https://api.themoviedb.org/3/movie/{movie_id}'
-
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    # Bundle sub-resources (e.g. `include=videos,recommendations`) into the one upstream request.
+    try:
+        params["append_to_response"] = append_to_response(request.args.get('include'), MOVIE_APPENDABLE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    response = requests.get(url, headers=headers, params=params)
+    path = f"/movie/{movie_id}"
 
-    if response.status_code == 200:
-        json_data = response.json()
-        return jsonify(json_data)  # Return only the 'results' array
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=params, ttl=DETAIL_TTL, fields=request.args.get('fields'))
 
 @bp.route('/set_movie_state', methods=['POST'])
 def set_movie_state():
@@ -204,18 +139,14 @@ def set_movie_state():
         return jsonify({'error': 'Missing required parameters'}), 400
 
     try:
-        existing_state = MovieState.query.filter_by(user_id=user_id, movie_id=movie_id).first()
-        if existing_state:
-            existing_state.state = state
-        else:
-            new_state = MovieState(
-                user_id=user_id, 
-                movie_id=movie_id, 
-                state=state, 
-                title=title, 
-                image_path=image
-            )
-            db.session.add(new_state)
+        upsert_states(MovieState, 'movie_id', [{
+            'user_id': user_id,
+            'movie_id': movie_id,
+            'state': state,
+            'title': title,
+            'image_path': image
+        }])
+        bump_state_version(user_id)
         db.session.commit()
         return jsonify({'message': 'Movie state updated successfully'}), 200
     except Exception as e:
@@ -223,6 +154,7 @@ def set_movie_state():
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/get_movie_states/<int:user_id>', methods=['GET'])    
+@conditional_on_state_version
 def get_movie_states(user_id):
     try:
         movie_states = MovieState.query.filter_by(user_id=user_id).all()
@@ -234,39 +166,52 @@ def get_movie_states(user_id):
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/watchlist/completed/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_completed_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'Completed')
 
 @bp.route('/watchlist/watching/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_watching_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'Watching')
 
 @bp.route('/watchlist/plan-to-watch/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_plan_to_watch_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'Plan to Watch')
 
 @bp.route('/watchlist/on-hold/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_on_hold_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'On Hold')
 
 @bp.route('/watchlist/dropped/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_dropped_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'Dropped')
 
+def serialize_state(item):
+    return {
+        'id': item.id,
+        'user_id': item.user_id,
+        'movie_id': item.movie_id,
+        'state': item.state,
+        'title': item.title,  # Add movie title
+        'image_path': item.image_path  # Add movie image path
+    }
+
 def get_watchlist_by_state(user_id, state):
     try:
-        watchlist = MovieState.query.filter_by(user_id=user_id, state=state).all()
-        result = []
-        for item in watchlist:
-            result.append({
-                'id': item.id,
-                'user_id': item.user_id,
-                'movie_id': item.movie_id,
-                'state': item.state,
-                'title': item.title,  # Add movie title
-                'image_path': item.image_path  # Add movie image path
-            })
-        return jsonify(result), 200
+        query = MovieState.query.filter_by(user_id=user_id, state=state)
+
+        # Clients that pass `limit` or `cursor` get the list a page at a time.
+        if wants_page():
+            watchlist, next_cursor = keyset_page(query, MovieState, state)
+            return jsonify({'results': [serialize_state(item) for item in watchlist], 'next_cursor': next_cursor}), 200
+
+        return jsonify([serialize_state(item) for item in query.all()]), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
@@ -288,6 +233,7 @@ def remove_from_watchlist(state, user_id, movie_id):
         movie_state = MovieState.query.filter_by(user_id=user_id, movie_id=movie_id, state=state).first()
         if movie_state:
             db.session.delete(movie_state)
+            bump_state_version(user_id)
             db.session.commit()
             return jsonify({'message': 'Movie removed successfully'}), 200
         else:
@@ -298,46 +244,22 @@ def remove_from_watchlist(state, user_id, movie_id):
 
 @bp.route('/movies/recommendations/<int:movie_id>', methods=['GET'])
 def get_recommendations(movie_id):
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = f"https://api.themoviedb.org/3/movie/{movie_id}/recommendations"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
+    path = f"/movie/{movie_id}/recommendations"
     
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=params, ttl=DETAIL_TTL, fields=request.args.get('fields'))
 
 @bp.route('/movies/video/<int:movie_id>', methods=['GET'])
 def get_video(movie_id):
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = f"https://api.themoviedb.org/3/movie/{movie_id}/videos"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
+    path = f"/movie/{movie_id}/videos"
     
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
\ No newline at end of file
+    return tmdb.proxy(path, params=params, ttl=DETAIL_TTL)
\ No newline at end of file
@@ -0,0 +1,57 @@
+import base64
+import binascii
+import json
+
+from flask import current_app, request
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(state, last_id):
+    """Build an opaque token pointing just past `last_id` in the `state` list."""
+    raw = json.dumps([state, last_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        state, last_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(state, str) or not isinstance(last_id, int):
+        raise InvalidCursor('Invalid cursor')
+    return state, last_id
+
+
+def wants_page():
+    return 'limit' in request.args or 'cursor' in request.args
+
+
+def page_limit():
+    limit = request.args.get('limit', type=int) or current_app.config['WATCHLIST_PAGE_SIZE']
+    return max(1, min(limit, current_app.config['WATCHLIST_MAX_PAGE_SIZE']))
+
+
+def keyset_page(query, model, state):
+    """Return one page of `query` ordered by (state, id), plus the cursor of the next page.
+
+    Seeks past the last id of the previous page instead of using OFFSET, so deep
+    pages cost the same as the first one.
+    """
+    limit = page_limit()
+    token = request.args.get('cursor')
+    if token:
+        cursor_state, last_id = decode_cursor(token)
+        if cursor_state != state:
+            raise InvalidCursor('Cursor does not belong to this watchlist')
+        query = query.filter(model.id > last_id)
+
+    items = query.order_by(model.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(state, items[-1].id)
+    return items, next_cursor
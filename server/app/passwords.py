@@ -0,0 +1,110 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashing jobs are already running or queued."""
+
+
+class HashPool:
+    """Runs password hashing on a small dedicated thread pool.
+
+    Key derivation is CPU-bound and releases the GIL, so bounding the pool to
+    `workers` threads bounds how many cores a login storm can take from the
+    request workers. At most `queue_size` further jobs may wait for a thread;
+    beyond that callers get HasherBusy instead of piling up.
+    """
+
+    def __init__(self, method, salt_length, workers=2, queue_size=32):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.rehashed = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, method=self.method, salt_length=self.salt_length)
+
+    def verify(self, stored, password):
+        return self._run(check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        """Whether `stored` was made with other parameters than the configured ones."""
+        try:
+            method, salt, _ = stored.split("$", 2)
+        except ValueError:
+            return True
+        return method != self.method or len(salt) < self.salt_length
+
+    def stats(self):
+        return {
+            "method": self.method.split(":", 1)[0],
+            "workers": self.workers,
+            "pending": self._pending,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+        }
+
+    def _run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy()
+        with self._lock:
+            self._pending += 1
+        try:
+            return self._executor.submit(fn, *args, **kwargs).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class PasswordHasher:
+    """Flask extension exposing the app-scoped password hashing pool."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["password_hasher"] = HashPool(
+            method=app.config["PASSWORD_HASH_METHOD"],
+            salt_length=app.config["PASSWORD_SALT_LENGTH"],
+            workers=app.config["PASSWORD_HASH_WORKERS"],
+            queue_size=app.config["PASSWORD_HASH_QUEUE_SIZE"],
+        )
+
+    @property
+    def pool(self):
+        return current_app.extensions["password_hasher"]
+
+    def hash(self, password):
+        return self.pool.hash(password)
+
+    def verify(self, stored, password):
+        return self.pool.verify(stored, password)
+
+    def upgrade(self, user, password):
+        """Re-hash `user`'s password with the configured parameters if it was stored with others.
+
+        Must be called with the plain password right after it was verified. The
+        caller commits the session.
+        """
+        if not self.pool.needs_rehash(user.password):
+            return False
+        user.password = self.pool.hash(password)
+        self.pool.rehashed += 1
+        return True
+
+    def stats(self):
+        return self.pool.stats()
@@ -1,36 +1,22 @@
-import requests
 from flask import jsonify, request
 
+from app import tmdb
+from app.tmdb_api import DETAIL_TTL, PERSON_APPENDABLE, SEARCH_TIMEOUT, TRENDING_TTL, append_to_response
 from app.people import bp
-from config import Config
 
 @bp.route('/people/popular', methods=['GET'])    
 def get_popular_people():
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = "https://api.themoviedb.org/3/trending/person/day"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params=params)    
+    path = "/trending/person/day"
     
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=params, ttl=TRENDING_TTL, fields=request.args.get('fields'))
     
 @bp.route('/search/popular', methods=['GET'])        
 def search_popular_person():
-    token = Config.ACCESS_TOKEN
-
     params = {
         "query": request.args.get("query", ""),
         "language": request.args.get('language', 'en-US'),
@@ -38,39 +24,22 @@ def search_popular_person():
         "include_adult": request.args.get('include_adult', 'true'),
     }
 
-    url = "https://api.themoviedb.org/3/search/person"
+    path = "/search/person"
 
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-
-    response = requests.get(url, headers=headers, params=params)
-
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.search("person", path, params, fields=request.args.get('fields'), timeout=SEARCH_TIMEOUT)
 
 @bp.route('/people/<int:person_id>', methods=['GET'])    
 def get_people_details(person_id):
-    token = Config.ACCESS_TOKEN
-
     params = {
         "language": request.args.get('language', 'en-US'),
     }
 
-    url = f'https://api.themoviedb.org/3/person/{person_id}'
-
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    # Bundle sub-resources (e.g. `include=combined_credits,images`) into the one upstream request.
+    try:
+        params["append_to_response"] = append_to_response(request.args.get('include'), PERSON_APPENDABLE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    response = requests.get(url, headers=headers, params=params)
+    path = f"/person/{person_id}"
 
-    if response.status_code == 200:
-        json_data = response.json()
-        return jsonify(json_data)  # Return only the 'results' array
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
\ No newline at end of file
+    return tmdb.proxy(path, params=params, ttl=DETAIL_TTL, fields=request.args.get('fields'))
\ No newline at end of file
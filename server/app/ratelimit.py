@@ -0,0 +1,222 @@
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from flask import Response, current_app, request, session
+
+from app.sqlite_store import SQLiteConnections, transaction
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 60 * 60, "day": 24 * 60 * 60}
+
+# Stores drop counters of past windows once every this many hits.
+PRUNE_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT NOT NULL,
+    window INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (key, window)
+);
+CREATE INDEX IF NOT EXISTS ix_counters_expires_at ON counters (expires_at);
+"""
+
+
+def parse_limit(value):
+    """Parse a limit such as `60/minute` into `(requests, window_seconds)`."""
+    try:
+        count, period = value.strip().split("/")
+        count, window = int(count), PERIODS[period.strip().rstrip("s")]
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate limit: {value!r}")
+    if count < 1:
+        # A blueprint that should take no requests is better removed; 0 would divide by zero later.
+        raise ValueError(f"Rate limit must allow at least one request: {value!r}")
+    return count, window
+
+
+def parse_limits(value):
+    """Parse per-blueprint limits such as `movies=60/minute,library=20/minute`."""
+    limits = {}
+    for item in (value or "").split(","):
+        if item.strip():
+            blueprint, limit = item.split("=", 1)
+            limits[blueprint.strip()] = parse_limit(limit)
+    return limits
+
+
+def sliding_window(previous, current, window, now, limit):
+    """Decide on a request from the counts of the previous and current fixed windows.
+
+    The previous window's count is weighted by how much of it still overlaps
+    the sliding window ending now. Returns `(allowed, retry_after)`.
+    """
+    elapsed = now % window
+    weight = 1 - elapsed / window
+    if previous * weight + current < limit:
+        return True, 0
+
+    # When the estimate will fall below the limit: within this window, or once `current` becomes `previous`.
+    if current < limit:
+        wait = window * (1 - (limit - current) / previous) - elapsed
+    else:
+        wait = window - elapsed + window * (1 - limit / current)
+    return False, max(1, math.ceil(wait))
+
+
+class MemoryStore:
+    """Per-process sliding-window counters."""
+
+    def __init__(self):
+        self._counters = {}
+        self._hits = 0
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window, now):
+        index = int(now // window)
+        with self._lock:
+            self._hits += 1
+            if self._hits % PRUNE_EVERY == 0:
+                self._prune(now)
+
+            counter = self._counters.get(key)
+            if counter is None or counter[0] < index - 1:
+                counter = [index, 0, 0, window]
+            elif counter[0] == index - 1:
+                counter = [index, counter[2], 0, window]
+            self._counters[key] = counter
+
+            allowed, retry_after = sliding_window(counter[1], counter[2], window, now, limit)
+            if allowed:
+                counter[2] += 1
+            return allowed, retry_after
+
+    def _prune(self, now):
+        for key, (index, _, _, window) in list(self._counters.items()):
+            if index < int(now // window) - 1:
+                del self._counters[key]
+
+
+class SQLiteStore:
+    """Sliding-window counters in a SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._hits = 0
+        self._connections = SQLiteConnections(path, SCHEMA)
+
+    def hit(self, key, limit, window, now):
+        index = int(now // window)
+        connection = self._connections.get()
+        with transaction(connection):
+            counts = dict(connection.execute(
+                "SELECT window, count FROM counters WHERE key = ? AND window >= ?", (key, index - 1)
+            ).fetchall())
+            allowed, retry_after = sliding_window(counts.get(index - 1, 0), counts.get(index, 0), window, now, limit)
+            if allowed:
+                # A counter is needed until the window after its own has passed.
+                connection.execute(
+                    "INSERT INTO counters (key, window, count, expires_at) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (key, window) DO UPDATE SET count = count + 1", (key, index, (index + 2) * window)
+                )
+
+            self._hits += 1
+            if self._hits % PRUNE_EVERY == 0:
+                connection.execute("DELETE FROM counters WHERE expires_at < ?", (now,))
+        return allowed, retry_after
+
+
+class RateLimiter:
+    """Limits how many requests each client may make to each blueprint.
+
+    Clients are identified by their logged-in user id, falling back to their IP
+    address (see `client_ip` for deployments behind proxies). Every blueprint gets `RATELIMIT_DEFAULT` unless
+    `RATELIMIT_BLUEPRINT_LIMITS` overrides it. Rejected requests are answered
+    with a 429 and `Retry-After` before the view runs.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config["RATELIMIT_ENABLED"]:
+            return
+        path = app.config["RATELIMIT_STORAGE_PATH"]
+        app.extensions["limiter"] = BlueprintLimits(
+            default=parse_limit(app.config["RATELIMIT_DEFAULT"]),
+            limits=parse_limits(app.config["RATELIMIT_BLUEPRINT_LIMITS"]),
+            store=SQLiteStore(path) if path else MemoryStore(),
+        )
+        app.before_request(self.before_request)
+
+    def before_request(self):
+        if request.method == "OPTIONS":
+            return None
+        return current_app.extensions["limiter"].check(request.blueprint or "app", client_identity())
+
+    def stats(self):
+        limits = current_app.extensions.get("limiter")
+        return limits.stats() if limits is not None else None
+
+
+class BlueprintLimits:
+    """The limits and counter store of one app."""
+
+    def __init__(self, default, limits, store):
+        self.default = default
+        self.limits = limits
+        self.store = store
+        self.rejected = 0
+        self.errors = 0
+
+    def check(self, blueprint, identity):
+        """Count a request, returning a 429 response if it is over the limit and None otherwise."""
+        limit, window = self.limits.get(blueprint, self.default)
+        key = f"{blueprint}:{window}:{identity}"
+        try:
+            allowed, retry_after = self.store.hit(key, limit, window, time.time())
+        except sqlite3.Error:
+            # A broken shared store must not take the API down with it.
+            self.errors += 1
+            logger.exception("Rate limit store failed")
+            return None
+
+        if allowed:
+            return None
+        self.rejected += 1
+        body = json.dumps({"error": "Too many requests"})
+        return Response(body, status=429, headers={"Retry-After": str(retry_after)}, content_type="application/json")
+
+    def stats(self):
+        return {"rejected": self.rejected, "errors": self.errors}
+
+
+def client_identity():
+    # Read the user id Flask-Login keeps in the session, so that no user has to be loaded.
+    user_id = session.get("_user_id")
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{client_ip()}"
+
+
+def client_ip():
+    """The client's address, read from X-Forwarded-For when the app runs behind trusted proxies.
+
+    With `RATELIMIT_TRUSTED_PROXIES` set to the number of proxies in front of
+    the app, each of which appends the address it received the request from,
+    the client is that many entries from the end of the header (as with
+    werkzeug's ProxyFix). Entries further left are client-supplied and ignored.
+    """
+    hops = current_app.config["RATELIMIT_TRUSTED_PROXIES"]
+    if hops:
+        forwarded = [ip.strip() for ip in request.headers.get("X-Forwarded-For", "").split(",") if ip.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr
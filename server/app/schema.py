@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask import current_app
+from flask_migrate import upgrade
+
+from app import db, migrate
+
+# Arbitrary key for the Postgres advisory lock held while migrating at startup.
+MIGRATION_LOCK_ID = 0x62696e6765
+
+# Schema status per database URL, computed once for the life of the process.
+_schema_status = {}
+
+
+def check_schema_version(refresh=False):
+    """Compare the database's Alembic revision with the migration scripts' head.
+
+    The result is cached, so calling this from request handlers costs nothing
+    after the first call. Pass `refresh=True` after running migrations.
+    """
+    url = str(db.engine.url)
+    if refresh or url not in _schema_status:
+        _schema_status[url] = _read_schema_status()
+    return _schema_status[url]
+
+
+def _read_schema_status():
+    config = migrate.get_config()
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+
+    with db.engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+
+    status = {
+        "current": sorted(current),
+        "head": sorted(heads),
+        "up_to_date": current == heads,
+    }
+    if not status["up_to_date"]:
+        current_app.logger.warning(
+            "Database schema is at %s but migrations are at %s; run `flask db upgrade`.",
+            status["current"], status["head"]
+        )
+    return status
+
+
+def upgrade_on_startup():
+    """Run `flask db upgrade` at most one process at a time.
+
+    Every gunicorn worker imports the app and gets here. The first to take
+    the lock migrates; the rest wait for it and then find nothing to do, so
+    migrations never run concurrently (which `CREATE INDEX CONCURRENTLY`
+    and most DDL do not survive).
+    """
+    with _migration_lock():
+        upgrade()
+
+
+@contextmanager
+def _migration_lock():
+    if db.engine.dialect.name == "postgresql":
+        # Session-level lock on its own connection, so it spans the migration's transactions.
+        with db.engine.connect() as connection:
+            connection.execute(sa.text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+            try:
+                yield
+            finally:
+                connection.execute(sa.text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                connection.commit()
+        return
+
+    import fcntl  # POSIX only, like the other cross-worker lock files
+
+    with open(current_app.config["MIGRATE_LOCK_PATH"], "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SQLiteConnections:
+    """Per-thread connections to a SQLite file shared by the workers on a host.
+
+    sqlite3 connections may not be shared between threads, so each thread gets
+    its own, in autocommit mode. When a `schema` is given, the file's directory
+    is created, the database is switched to WAL (so readers never wait on the
+    writer) and the schema script is run once up front.
+    """
+
+    def __init__(self, path, schema=None, timeout=5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        if schema is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = self.get()
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(schema)
+
+    def get(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+
+@contextmanager
+def transaction(connection):
+    """Run a multi-statement write on an autocommit connection, taking the write lock up front."""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
@@ -0,0 +1,207 @@
+import json
+
+from flask import Response, current_app, jsonify, request
+
+from app.compression import compress, negotiate_encoding
+from app.tmdb_api.cache import CachedResponse
+from app.tmdb_api.circuit_breaker import CircuitBreaker
+from app.tmdb_api.client import TMDbClient
+from app.tmdb_api.projection import parse_fields
+from app.tmdb_api.search_index import SearchIndex
+
+# Size of the chunks used when streaming an uncached upstream body to the client.
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Cache lifetimes (in seconds) for the different kinds of TMDb resources.
+LIST_TTL = 10 * 60
+TRENDING_TTL = 15 * 60
+DETAIL_TTL = 60 * 60
+ENDED_SEASON_TTL = 7 * 24 * 60 * 60  # Seasons and episodes that finished airing rarely change
+
+# Read timeout (in seconds) for searches, which users wait on while typing.
+SEARCH_TIMEOUT = 5
+
+# How long past their TTL fast-moving lists may still be served while a fresh copy is fetched.
+TRENDING_MAX_STALE = 60 * 60
+NOW_PLAYING_MAX_STALE = 6 * 60 * 60
+
+# Sub-resources that may be bundled into a detail response through `append_to_response`.
+MOVIE_APPENDABLE = {"credits", "external_ids", "images", "keywords", "recommendations", "release_dates",
+                    "reviews", "similar", "videos", "watch/providers"}
+TV_APPENDABLE = {"aggregate_credits", "content_ratings", "credits", "external_ids", "images", "keywords",
+                 "recommendations", "reviews", "similar", "videos", "watch/providers"}
+PERSON_APPENDABLE = {"combined_credits", "external_ids", "images", "movie_credits", "tv_credits"}
+
+# TMDb accepts at most this many sub-resources per request.
+MAX_APPENDED = 20
+
+# Number of results a typeahead search returns from the local index.
+TYPEAHEAD_LIMIT = 20
+
+
+def append_to_response(include, allowed):
+    """Turn an `include=` query value into TMDb's `append_to_response` parameter.
+
+    Names are de-duplicated and sorted so that equivalent requests share a cache
+    entry. Raises ValueError for names outside `allowed`.
+    """
+    if not include:
+        return None
+    names = sorted({name.strip() for name in include.split(",") if name.strip()})
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unsupported include: {', '.join(unknown)}")
+    if len(names) > MAX_APPENDED:
+        raise ValueError(f"At most {MAX_APPENDED} includes are allowed")
+    return ",".join(names) or None
+
+
+class TMDb:
+    """Flask extension exposing the app-scoped TMDb client to the blueprints."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        client = TMDbClient(
+            access_token=app.config["ACCESS_TOKEN"],
+            base_url=app.config["TMDB_BASE_URL"],
+            pool_size=app.config["TMDB_POOL_SIZE"],
+            timeout=app.config["TMDB_TIMEOUT"],
+            cache_max_bytes=app.config["TMDB_CACHE_MAX_BYTES"],
+            refresh_workers=app.config["TMDB_REFRESH_WORKERS"],
+            lock_dir=app.config["TMDB_LOCK_DIR"],
+            fanout_workers=app.config["TMDB_FANOUT_WORKERS"],
+            shared_cache_path=app.config["TMDB_SHARED_CACHE_PATH"],
+            shared_cache_max_bytes=app.config["TMDB_SHARED_CACHE_MAX_BYTES"],
+            rate_limit=app.config["TMDB_RATE_LIMIT"],
+            rate_limit_burst=app.config["TMDB_RATE_LIMIT_BURST"],
+            rate_limit_max_wait=app.config["TMDB_RATE_LIMIT_MAX_WAIT"],
+            rate_limit_path=app.config["TMDB_RATE_LIMIT_PATH"],
+            connect_timeout=app.config["TMDB_CONNECT_TIMEOUT"],
+            retries=app.config["TMDB_RETRIES"],
+            retry_backoff=app.config["TMDB_RETRY_BACKOFF"],
+            breaker=CircuitBreaker(
+                failure_ratio=app.config["TMDB_BREAKER_FAILURE_RATIO"],
+                min_calls=app.config["TMDB_BREAKER_MIN_CALLS"],
+                reset_timeout=app.config["TMDB_BREAKER_RESET_TIMEOUT"],
+            ),
+            stale_if_error=app.config["TMDB_STALE_IF_ERROR"],
+        )
+        app.extensions["tmdb"] = client
+
+        path = app.config["SEARCH_INDEX_PATH"]
+        app.extensions["search_index"] = SearchIndex(path) if path else None
+
+    @property
+    def client(self):
+        return current_app.extensions["tmdb"]
+
+    def get(self, path, params=None, **kwargs):
+        return self.client.get(path, params=params, **kwargs)
+
+    def proxy(self, path, params=None, ttl=None, fields=None, **kwargs):
+        """Forward a TMDb response to the client without decoding and re-encoding it.
+
+        The upstream bytes and content type are passed through unchanged: cached
+        bodies are sent from memory, uncached ones are streamed as they arrive.
+        Compressed copies of cached bodies are kept with the entry, so hot pages
+        are only compressed once. `fields` is the raw `fields=` query value; a
+        projected payload is re-encoded and cached next to the upstream one.
+        Views that need to modify the payload otherwise should use `get`.
+        """
+        try:
+            fields = parse_fields(fields)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        response = self.client.get(path, params=params, ttl=ttl, stream=True, fields=fields, **kwargs)
+
+        if response.status_code != 200:
+            response.close()
+            current_app.logger.warning("TMDb returned %s for %s", response.status_code, path)
+            return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+
+        if isinstance(response, CachedResponse):
+            return self._cached_response(response)
+
+        content_type = response.headers.get("Content-Type", "application/json")
+        return Response(_stream_body(response), status=200, content_type=content_type)
+
+    def _cached_response(self, entry):
+        encoding = negotiate_encoding(len(entry.content))
+        if encoding is None:
+            response = Response(entry.content, status=200, content_type=entry.content_type)
+        else:
+            body = entry.variants.get(encoding)
+            if body is None:
+                body = compress(entry.content, encoding)
+                if self.client.cache is not None:
+                    self.client.cache.add_variant(entry, encoding, body)
+            response = Response(body, status=200, content_type=entry.content_type)
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def search(self, kind, path, params, fields=None, **kwargs):
+        """Answer a search from the local index when possible, falling back to `proxy`.
+
+        Only typeahead requests (`typeahead=true`) for the first page are served
+        locally, since index entries carry just an id, a title and a popularity.
+        A missing index or a query without local matches goes to TMDb.
+        """
+        index = current_app.extensions.get("search_index")
+        typeahead = request.args.get("typeahead", "false").lower() == "true"
+        if index is not None and typeahead and str(params.get("page", 1)) == "1" and index.is_ready(kind):
+            include_adult = str(params.get("include_adult", "false")).lower() == "true"
+            results = index.search(kind, params.get("query", ""), limit=TYPEAHEAD_LIMIT, include_adult=include_adult)
+            if results:
+                return jsonify({
+                    "page": 1,
+                    "results": results,
+                    "total_pages": 1,
+                    "total_results": len(results),
+                    "source": "index",
+                })
+
+        return self.proxy(path, params=params, fields=fields, **kwargs)
+
+    def proxy_many(self, sections, fields=None):
+        """Fetch several TMDb resources concurrently and return them as one JSON document.
+
+        `sections` maps each key of the combined document to the `get` keyword
+        arguments of its upstream request. Upstream bodies are spliced into the
+        document as-is; a section that fails is replaced by an error object.
+        `fields` projects every section, as in `proxy`.
+        """
+        try:
+            fields = parse_fields(fields)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        results = self.client.get_many([dict(call, stream=False, fields=fields) for call in sections.values()])
+
+        parts = []
+        failures = 0
+        for name, result in zip(sections, results):
+            if isinstance(result, Exception) or result.status_code != 200:
+                failures += 1
+                body = json.dumps({"error": "Unable to fetch data from TMDb"}).encode("utf-8")
+            else:
+                body = result.content
+            parts.append(json.dumps(name).encode("utf-8") + b":" + body)
+
+        status = 502 if failures == len(parts) else 200
+        return Response(b"{" + b",".join(parts) + b"}", status=status, content_type="application/json")
+
+    def stats(self):
+        return self.client.stats()
+
+
+def _stream_body(response):
+    # Release the pooled connection once the body has been sent, even if the client goes away.
+    try:
+        yield from response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+    finally:
+        response.close()
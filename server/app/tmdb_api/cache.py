@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedResponse:
+    """A fully buffered TMDb response, as stored in the response cache."""
+
+    __slots__ = ("status_code", "content", "content_type", "stored_at", "expires_at", "stale_until",
+                 "stale_if_error", "key", "variants")
+
+    def __init__(self, status_code, content, content_type, ttl=0, max_stale=0, stale_if_error=0, stored_at=None):
+        self.status_code = status_code
+        self.content = content
+        self.content_type = content_type
+        self.stored_at = time.monotonic() if stored_at is None else stored_at
+        self.expires_at = self.stored_at + ttl
+        # Past its TTL an entry may still be served while it is being refreshed, up to this point.
+        self.stale_until = self.expires_at + max_stale
+        # Beyond that it is kept for another `stale_if_error` seconds, to be served only when TMDb is failing.
+        self.stale_if_error = stale_if_error
+        self.key = None
+        # Compressed copies of `content`, by content encoding.
+        self.variants = {}
+
+    @classmethod
+    def from_response(cls, response, ttl=0, max_stale=0, stale_if_error=0):
+        return cls(
+            response.status_code,
+            response.content,
+            response.headers.get("Content-Type", "application/json"),
+            ttl=ttl,
+            max_stale=max_stale,
+            stale_if_error=stale_if_error,
+        )
+
+    @property
+    def size(self):
+        return len(self.content) + sum(len(body) for body in self.variants.values())
+
+    def is_fresh(self, now=None):
+        return (time.monotonic() if now is None else now) < self.expires_at
+
+    def is_usable(self, now=None):
+        return (time.monotonic() if now is None else now) < self.stale_until
+
+    def is_retained(self, now=None):
+        return (time.monotonic() if now is None else now) < self.stale_until + self.stale_if_error
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        # Cached bodies hold no connection; this mirrors requests.Response.
+        pass
+
+
+class ResponseCache:
+    """Thread-safe TTL cache with LRU eviction, bounded by the total size of the stored bodies.
+
+    Bounding by bytes rather than by entry count keeps memory predictable when large
+    detail payloads and small list pages share the cache.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, allow_stale=False, if_error=False):
+        """Return the entry stored under `key`, or None on a miss.
+
+        Expired entries are only returned when `allow_stale` is set and they are
+        still within their staleness bound; callers should check `is_fresh()`.
+        `if_error` also returns entries past that bound that are kept for
+        `stale_if_error`, for use when the upstream request failed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.is_retained(now):
+                self._remove(key)
+                entry = None
+
+            if entry is None or not (entry.is_fresh(now) or (allow_stale and entry.is_usable(now)) or if_error):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if entry.is_fresh(now):
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            return entry
+
+    def peek(self, key, allow_stale=False):
+        """Return the entry for `key` without updating recency or counters.
+
+        Only fresh entries are returned unless `allow_stale` is set.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not (entry.is_usable() if allow_stale else entry.is_fresh()):
+                return None
+            return entry
+
+    def set(self, key, entry):
+        size = self._entry_size(key, entry)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            entry.key = key
+            self._entries[key] = entry
+            self.current_bytes += size
+            self._evict()
+        return True
+
+    def add_variant(self, entry, encoding, body):
+        """Attach a compressed copy of a cached body, counting it against the byte budget."""
+        with self._lock:
+            if encoding in entry.variants:
+                return
+            entry.variants[encoding] = body
+            if self._entries.get(entry.key) is entry:
+                self.current_bytes += len(body)
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+    def _evict(self):
+        # Evict least recently used entries until we are back under budget.
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.current_bytes -= self._entry_size(key, entry)
+
+    @staticmethod
+    def _entry_size(key, entry):
+        return entry.size + len(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stops sending requests to an upstream that is mostly failing.
+
+    The breaker tracks the outcome of the last `window` requests. Once at least
+    `min_calls` are recorded and the share of failures reaches `failure_ratio`,
+    it opens and `allow` refuses requests for `reset_timeout` seconds. After
+    that a single trial request is let through: success closes the breaker,
+    failure opens it again.
+    """
+
+    def __init__(self, failure_ratio=0.5, min_calls=10, reset_timeout=30, window=20):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.opened = 0
+        self.rejected = 0
+        self._outcomes = deque(maxlen=max(window, min_calls))
+        self._changed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            # While open, and while a trial is out, refuse until `reset_timeout` has passed.
+            now = time.monotonic()
+            if now - self._changed_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._changed_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._set_state(CLOSED)
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_ratio):
+                self._open()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self._outcomes.count(False),
+                "calls": len(self._outcomes),
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+    def _open(self):
+        self.opened += 1
+        self._set_state(OPEN)
+
+    def _set_state(self, state):
+        self.state = state
+        self._changed_at = time.monotonic()
+        self._outcomes.clear()
@@ -0,0 +1,326 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.tmdb_api.cache import CachedResponse, ResponseCache
+from app.tmdb_api.circuit_breaker import CircuitBreaker
+from app.tmdb_api.projection import project
+from app.tmdb_api.rate_limit import RateLimitExceeded, SharedTokenBucket, TokenBucket, retry_after_seconds
+from app.tmdb_api.shared_cache import SharedCache
+from app.tmdb_api.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# How many times a request answered with 429 is retried after its `Retry-After` delay.
+MAX_RATE_LIMIT_RETRIES = 2
+
+# Upper bound on a single retry backoff delay, in seconds.
+MAX_RETRY_BACKOFF = 5
+
+
+class TMDbClient:
+    """Thin wrapper around a keep-alive requests session for the TMDb API.
+
+    One client is created per app (and therefore per worker), so every view
+    reuses the same connection pool instead of opening a new TCP+TLS
+    connection to api.themoviedb.org on each request.
+    """
+
+    def __init__(self, access_token, base_url="https://api.themoviedb.org/3", pool_size=10, timeout=10,
+                 cache_max_bytes=0, refresh_workers=2, lock_dir=None, fanout_workers=8,
+                 shared_cache_path=None, shared_cache_max_bytes=0, rate_limit=0, rate_limit_burst=None,
+                 rate_limit_max_wait=5, rate_limit_path=None, connect_timeout=3.05, retries=2,
+                 retry_backoff=0.2, breaker=None, stale_if_error=0):
+        self.base_url = base_url.rstrip("/")
+        # Default (connect, read) timeouts; a request may override the read timeout or both.
+        self.timeout = (connect_timeout, timeout)
+        self.connect_timeout = connect_timeout
+        # Failed GETs (connection errors, timeouts, 5xx) are retried with jittered exponential backoff.
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker or CircuitBreaker()
+        # How long past their staleness bound cached entries are kept to stand in for failed fetches.
+        self.stale_if_error = stale_if_error
+        self.stale_fallbacks = 0
+        # Outbound requests per second, for this worker or (with `rate_limit_path`) for the whole host.
+        self.rate_limiter = None
+        if rate_limit and rate_limit_path:
+            self.rate_limiter = SharedTokenBucket(rate_limit_path, rate_limit, rate_limit_burst, rate_limit_max_wait)
+        elif rate_limit:
+            self.rate_limiter = TokenBucket(rate_limit, rate_limit_burst, rate_limit_max_wait)
+        self.rate_limit_max_wait = rate_limit_max_wait
+        self.upstream_rate_limited = 0
+        self.cache = ResponseCache(cache_max_bytes) if cache_max_bytes else None
+        # Optional host-wide tier behind the in-memory cache, shared by workers and kept across restarts.
+        self.shared = None
+        if self.cache is not None and shared_cache_path:
+            self.shared = SharedCache(shared_cache_path, shared_cache_max_bytes)
+        self.refreshes = 0
+        # Identical concurrent misses share one upstream request. Workers can only share a fetch through
+        # the shared tier, so without one the lock files would just serialize them.
+        if lock_dir and self.shared is None:
+            logger.warning("Ignoring the TMDb lock directory: it needs the shared cache tier to be configured")
+            lock_dir = None
+        self.flight = SingleFlight(lock_dir=lock_dir, lock_timeout=timeout)
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "accept": "application/json",
+            "Authorization": f"Bearer {access_token}"
+        })
+
+        # All traffic goes to a single host, so one pool of `pool_size` connections is enough.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Background refreshes of stale entries, at most one per cache key at a time.
+        self._refresh_executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="tmdb-refresh")
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+        # Concurrent fetches for aggregate endpoints; bounded so one page cannot exhaust the pool.
+        self._fanout_executor = ThreadPoolExecutor(max_workers=fanout_workers, thread_name_prefix="tmdb-fanout")
+
+    def url_for(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def cache_key(self, path, params=None):
+        # Sort the parameters so that equivalent queries share a single cache entry.
+        items = sorted((k, str(v)) for k, v in (params or {}).items() if v is not None)
+        return requests.Request("GET", self.url_for(path), params=items).prepare().url
+
+    def get(self, path, params=None, ttl=None, max_stale=0, timeout=None, stream=False, fields=None):
+        """Fetch `path` from TMDb.
+
+        When `ttl` is given and the cache is enabled, successful responses are
+        cached for `ttl` seconds and later calls are answered from memory.
+        `ttl` may also be a callable that picks the lifetime from the response.
+        With `max_stale`, an expired entry is still served for up to that many
+        seconds while a background refresh replaces it.
+        Otherwise `stream` leaves the body unread so it can be forwarded in chunks.
+        `fields` (a tuple from `parse_fields`) trims the body to those fields.
+        """
+        if fields:
+            return self._get_projected(path, params, fields, ttl=ttl, max_stale=max_stale, timeout=timeout)
+
+        if not ttl or self.cache is None:
+            return self._request(path, params, timeout, stream=stream)
+
+        key = self.cache_key(path, params)
+        cached = self.cache.get(key, allow_stale=bool(max_stale))
+        if cached is None:
+            cached = self._from_shared(key, allow_stale=bool(max_stale))
+        if cached is not None:
+            if not cached.is_fresh():
+                self._schedule_refresh(key, path, params, ttl, max_stale, timeout)
+            return cached
+
+        return self._fetch(key, path, params, ttl, max_stale, timeout)
+
+    def _get_projected(self, path, params, fields, **kwargs):
+        raw = self.get(path, params, **kwargs)
+        if raw.status_code != 200:
+            return raw
+
+        if not isinstance(raw, CachedResponse) or raw.key is None:
+            return CachedResponse(200, project(raw.content, fields), "application/json")
+
+        # Projections live next to the raw entry and are only valid for the version they were made from.
+        key = f"{raw.key}#fields={','.join(fields)}"
+        projected = self.cache.peek(key, allow_stale=True)
+        if projected is not None and projected.stored_at == raw.stored_at:
+            return projected
+
+        projected = CachedResponse(200, project(raw.content, fields), "application/json", stored_at=raw.stored_at)
+        projected.expires_at = raw.expires_at
+        projected.stale_until = raw.stale_until
+        projected.stale_if_error = raw.stale_if_error
+        self.cache.set(key, projected)
+        return projected
+
+    def get_many(self, calls):
+        """Run several `get` calls concurrently and return their results in order.
+
+        Each call is a dict of `get` keyword arguments. A call that raises yields
+        the exception in its slot instead of failing the others.
+        """
+        futures = [self._fanout_executor.submit(self.get, **call) for call in calls]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.warning("TMDb fan-out request failed: %s", e)
+                results.append(e)
+        return results
+
+    def _fetch(self, key, path, params, ttl, max_stale, timeout):
+        return self.flight.do(key, lambda: self._load(key, path, params, ttl, max_stale, timeout))
+
+    def _from_shared(self, key, allow_stale=False):
+        if self.shared is None:
+            return None
+        entry = self.shared.get(key, allow_stale=allow_stale)
+        if entry is not None:
+            entry.stale_if_error = self.stale_if_error
+            self.cache.set(key, entry)
+        return entry
+
+    def _load(self, key, path, params, ttl, max_stale, timeout):
+        # Another thread (or worker) may have filled the entry while we waited for the flight.
+        cached = self.cache.peek(key) or self._from_shared(key)
+        if cached is not None:
+            return cached
+
+        response = self._request(path, params, timeout)
+        if response.status_code != 200:
+            return self._stale_fallback(key, response)
+
+        if callable(ttl):
+            ttl = ttl(response)
+        entry = CachedResponse.from_response(response, ttl=ttl, max_stale=max_stale,
+                                             stale_if_error=self.stale_if_error)
+        self.cache.set(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, entry)
+        return entry
+
+    def _stale_fallback(self, key, response):
+        # When TMDb is failing (or the breaker is open), a stale copy beats an error page.
+        if response.status_code < 500 and response.status_code != 429:
+            return response
+        entry = self.cache.get(key, if_error=True)
+        if entry is None:
+            return response
+        response.close()
+        self.stale_fallbacks += 1
+        logger.warning("Serving stale %s after TMDb returned %s", key, response.status_code)
+        return entry
+
+    def _schedule_refresh(self, key, path, params, ttl, max_stale, timeout):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresh_executor.submit(self._refresh, key, path, params, ttl, max_stale, timeout)
+
+    def _refresh(self, key, path, params, ttl, max_stale, timeout):
+        try:
+            response = self._fetch(key, path, params, ttl, max_stale, timeout)
+            if response.status_code == 200 and response.is_fresh():
+                self.refreshes += 1
+            else:
+                logger.warning("Background refresh of %s returned %s", key, response.status_code)
+        except Exception:
+            # The stale copy stays in place until its staleness bound runs out.
+            logger.exception("Background refresh of %s failed", key)
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+    def _request(self, path, params=None, timeout=None, stream=False):
+        """Send one GET to TMDb, within the outbound rate limit and the circuit breaker.
+
+        Transport errors (connection failures, timeouts, truncated bodies) and
+        5xx responses are retried up to `retries` times with jittered
+        exponential backoff; when they run out, errors are turned into 502/504
+        responses. A 429 pauses the rate limiter for the `Retry-After` delay and
+        the request is retried, unless that delay is longer than requests may
+        queue for. While the breaker is open, a 503 is returned without
+        contacting TMDb; otherwise the breaker records one outcome per call,
+        however many attempts it took.
+        """
+        timeout = self._timeouts(timeout)
+        if not self.breaker.allow():
+            return _unavailable_response(503, "TMDb is unavailable")
+        rate_limited = 0
+        failures = 0
+        while True:
+            if self.rate_limiter is not None:
+                try:
+                    self.rate_limiter.acquire()
+                except RateLimitExceeded as e:
+                    logger.warning("Not requesting %s: %s", path, e)
+                    return _unavailable_response(503, "Outbound rate limit reached")
+
+            try:
+                response = self.session.get(self.url_for(path), params=params, timeout=timeout, stream=stream)
+            except requests.RequestException as e:
+                if failures >= self.retries:
+                    self.breaker.record_failure()
+                    logger.warning("Requesting %s failed: %s", path, e)
+                    status = 504 if isinstance(e, requests.Timeout) else 502
+                    return _unavailable_response(status, "Unable to reach TMDb")
+                failures += 1
+                self._backoff(failures)
+                continue
+
+            if response.status_code >= 500:
+                if failures >= self.retries:
+                    self.breaker.record_failure()
+                    return response
+                response.close()
+                failures += 1
+                self._backoff(failures)
+                continue
+
+            # Anything else, 429 included, shows that TMDb is up.
+            if response.status_code != 429:
+                self.breaker.record_success()
+                return response
+
+            self.upstream_rate_limited += 1
+            retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            logger.warning("TMDb rate limited %s, retry after %.2fs", path, retry_after)
+            if self.rate_limiter is not None:
+                self.rate_limiter.pause(retry_after)
+            if rate_limited == MAX_RATE_LIMIT_RETRIES or retry_after > self.rate_limit_max_wait:
+                self.breaker.record_success()
+                return response
+
+            response.close()
+            rate_limited += 1
+            if self.rate_limiter is None:
+                time.sleep(retry_after)
+
+    def _timeouts(self, timeout):
+        # A number only overrides the read timeout; a (connect, read) tuple overrides both.
+        if timeout is None:
+            return self.timeout
+        if isinstance(timeout, tuple):
+            return timeout
+        return (self.connect_timeout, timeout)
+
+    def _backoff(self, attempt):
+        # "Full jitter": spread retries out so that failing workers do not retry in lockstep.
+        time.sleep(random.uniform(0, min(MAX_RETRY_BACKOFF, self.retry_backoff * 2 ** (attempt - 1))))
+
+    def stats(self):
+        return {
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "shared_cache": self.shared.stats() if self.shared is not None else None,
+            "refreshes": self.refreshes,
+            "singleflight": self.flight.stats(),
+            "rate_limit": self.rate_limiter.stats() if self.rate_limiter is not None else None,
+            "upstream_rate_limited": self.upstream_rate_limited,
+            "circuit_breaker": self.breaker.stats(),
+            "stale_fallbacks": self.stale_fallbacks,
+        }
+
+    def close(self):
+        self._refresh_executor.shutdown(wait=False)
+        self._fanout_executor.shutdown(wait=False)
+        self.session.close()
+
+
+def _unavailable_response(status_code, message):
+    # Stands in for an upstream response when the request could not be sent or did not complete.
+    body = json.dumps({"status_message": message}).encode("utf-8")
+    return CachedResponse(status_code, body, "application/json")
@@ -0,0 +1,55 @@
+import json
+import re
+
+# Named field sets accepted by `fields=`. `card` is what list views render; it covers
+# movies, TV shows and people so one preset works for every route.
+PRESETS = {
+    "card": ("id", "media_type", "title", "name", "poster_path", "profile_path", "vote_average",
+             "release_date", "first_air_date", "known_for_department"),
+    "full": None,
+}
+
+# Pagination keys kept on list payloads whatever the projection.
+LIST_KEYS = ("page", "total_pages", "total_results", "dates")
+
+MAX_FIELDS = 50
+FIELD_NAME = re.compile(r"^[a-z][a-z0-9_]*$")
+
+
+def parse_fields(value):
+    """Turn a `fields=` value (a preset name or a comma-separated list) into a sorted field tuple.
+
+    Returns None when the full payload should be sent. Raises ValueError for
+    malformed field names.
+    """
+    if not value:
+        return None
+    if value in PRESETS:
+        fields = PRESETS[value]
+        return tuple(sorted(fields)) if fields else None
+
+    fields = sorted({name.strip() for name in value.split(",") if name.strip()})
+    if not fields or len(fields) > MAX_FIELDS or not all(FIELD_NAME.match(name) for name in fields):
+        raise ValueError("Invalid fields parameter")
+    return tuple(fields)
+
+
+def project(content, fields):
+    """Reduce a TMDb JSON body to `fields`.
+
+    List payloads keep their pagination keys and have each result projected;
+    anything else is projected at the top level.
+    """
+    payload = json.loads(content)
+    if isinstance(payload, dict) and isinstance(payload.get("results"), list):
+        projected = {key: payload[key] for key in LIST_KEYS if key in payload}
+        projected["results"] = [_pick(item, fields) for item in payload["results"]]
+    else:
+        projected = _pick(payload, fields)
+    return json.dumps(projected, separators=(",", ":")).encode("utf-8")
+
+
+def _pick(item, fields):
+    if not isinstance(item, dict):
+        return item
+    return {key: item[key] for key in fields if key in item}
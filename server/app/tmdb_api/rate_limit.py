@@ -0,0 +1,203 @@
+import email.utils
+import logging
+import sqlite3
+import threading
+import time
+
+from app.sqlite_store import SQLiteConnections, transaction
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    paused_until REAL NOT NULL
+);
+"""
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request would have to wait longer than the bucket's `max_wait`."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Outbound rate limit reached, retry in {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Process-wide token bucket for outbound requests.
+
+    Tokens refill at `rate` per second up to `burst`. Callers that find the
+    bucket empty sleep until a token is due, as long as that is within
+    `max_wait` seconds; otherwise `acquire` raises RateLimitExceeded. `pause`
+    stops handing out tokens for a while, e.g. for an upstream `Retry-After`.
+    """
+
+    def __init__(self, rate, burst=None, max_wait=5.0):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.max_wait = max_wait
+        self.waiting = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.pauses = 0
+        self._tokens = float(self.burst)
+        self._updated_at = self._now()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        started = self._now()
+        waited = False
+        try:
+            while True:
+                wait = self._take()
+                if wait <= 0:
+                    return self._now() - started if waited else 0.0
+                if self._now() + wait - started > self.max_wait:
+                    self.rejected += 1
+                    raise RateLimitExceeded(wait)
+                if not waited:
+                    waited = True
+                    self.throttled += 1
+                    self._adjust_waiting(1)
+                time.sleep(wait)
+        finally:
+            if waited:
+                self._adjust_waiting(-1)
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next `seconds`."""
+        self.pauses += 1
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._now() + seconds)
+
+    def stats(self):
+        tokens, paused_until = self._state()
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(tokens, 2),
+            "paused_for": round(max(0.0, paused_until - self._now()), 2),
+            "waiting": self.waiting,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "pauses": self.pauses,
+        }
+
+    def _take(self):
+        # Returns 0 once a token was taken, otherwise how long to wait before trying again.
+        with self._lock:
+            now = self._now()
+            self._tokens, self._updated_at, wait = _refill_and_take(
+                self._tokens, self._updated_at, self._paused_until, now, self.rate, self.burst
+            )
+            return wait
+
+    def _state(self):
+        with self._lock:
+            elapsed = self._now() - self._updated_at
+            return min(self.burst, self._tokens + elapsed * self.rate), self._paused_until
+
+    def _adjust_waiting(self, delta):
+        with self._lock:
+            self.waiting += delta
+
+    def _now(self):
+        return time.monotonic()
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket whose state lives in a SQLite file, so every worker on the host shares one budget.
+
+    Bucket state uses wall-clock time; queue depth is still reported per worker.
+    Errors are logged and let the request through, so a broken file never
+    blocks traffic to TMDb.
+    """
+
+    def __init__(self, path, rate, burst=None, max_wait=5.0, name="tmdb"):
+        self.path = path
+        self.name = name
+        self.errors = 0
+        super().__init__(rate, burst=burst, max_wait=max_wait)
+
+        self._connections = SQLiteConnections(path, SCHEMA)
+        connection = self._connections.get()
+        connection.execute(
+            "INSERT OR IGNORE INTO buckets (name, tokens, updated_at, paused_until) VALUES (?, ?, ?, 0)",
+            (name, float(self.burst), self._now()),
+        )
+
+    def pause(self, seconds):
+        self.pauses += 1
+        try:
+            self._connections.get().execute(
+                "UPDATE buckets SET paused_until = MAX(paused_until, ?) WHERE name = ?",
+                (self._now() + seconds, self.name),
+            )
+        except sqlite3.Error:
+            self.errors += 1
+            logger.exception("Shared rate limiter update failed")
+
+    def stats(self):
+        stats = super().stats()
+        stats["errors"] = self.errors
+        return stats
+
+    def _take(self):
+        connection = self._connections.get()
+        try:
+            with transaction(connection):
+                tokens, updated_at, paused_until = connection.execute(
+                    "SELECT tokens, updated_at, paused_until FROM buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                tokens, updated_at, wait = _refill_and_take(
+                    tokens, updated_at, paused_until, self._now(), self.rate, self.burst
+                )
+                connection.execute(
+                    "UPDATE buckets SET tokens = ?, updated_at = ? WHERE name = ?", (tokens, updated_at, self.name)
+                )
+        except sqlite3.Error:
+            self.errors += 1
+            logger.exception("Shared rate limiter update failed")
+            return 0
+        return wait
+
+    def _state(self):
+        try:
+            tokens, updated_at, paused_until = self._connections.get().execute(
+                "SELECT tokens, updated_at, paused_until FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+        except sqlite3.Error:
+            return 0.0, 0.0
+        return min(self.burst, tokens + (self._now() - updated_at) * self.rate), paused_until
+
+    def _now(self):
+        return time.time()
+
+
+def _refill_and_take(tokens, updated_at, paused_until, now, rate, burst):
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if now < paused_until:
+        return tokens, now, paused_until - now
+    if tokens >= 1:
+        return tokens - 1, now, 0
+    return tokens, now, (1 - tokens) / rate
+
+
+def retry_after_seconds(value, default=1.0):
+    """Parse a `Retry-After` header given either as seconds or as an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -0,0 +1,158 @@
+import gzip
+import json
+import logging
+import os
+import sqlite3
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.sqlite_store import SQLiteConnections
+
+logger = logging.getLogger(__name__)
+
+# Title field of each kind of TMDb daily ID export, and the key used for it in search results.
+KINDS = {
+    "movie": ("original_title", "title"),
+    "tv": ("original_name", "name"),
+    "person": ("name", "name"),
+}
+
+INSERT_BATCH_SIZE = 10000
+
+
+class SearchIndex:
+    """Local full-text index over TMDb's daily ID exports, used as a fast first pass for search.
+
+    Each kind has its own FTS5 table whose rowids are assigned in descending
+    popularity order. FTS5 walks matches in rowid order, so a prefix query can
+    stop after the first `limit` hits and they are already the most popular ones.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connections = SQLiteConnections(path)
+
+    def is_ready(self, kind):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            row = self._connections.get().execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (_table(kind),)
+            ).fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None
+
+    def search(self, kind, query, limit=20, include_adult=False):
+        """Return up to `limit` matches for a typeahead `query`, most popular first."""
+        match = _match_expression(query)
+        if match is None:
+            return []
+
+        sql = f"SELECT tmdb_id, name, popularity, adult FROM {_table(kind)} WHERE {_table(kind)} MATCH ?"
+        if not include_adult:
+            sql += " AND adult = 0"
+        sql += " ORDER BY rowid LIMIT ?"
+
+        _, title_key = KINDS[kind]
+        rows = self._connections.get().execute(sql, (match, limit)).fetchall()
+        return [
+            {"id": tmdb_id, title_key: name, "popularity": popularity, "adult": bool(adult)}
+            for tmdb_id, name, popularity, adult in rows
+        ]
+
+    def ingest(self, kind, source):
+        """Rebuild the index for `kind` from a TMDb daily ID export (gzipped or plain JSON lines).
+
+        The new table is built next to the old one and swapped in at the end, so
+        searches keep working while an ingest runs.
+        """
+        name_field, _ = KINDS[kind]
+        table = _table(kind)
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("DROP TABLE IF EXISTS temp.staging")
+            connection.execute(
+                "CREATE TEMP TABLE staging (tmdb_id INTEGER, name TEXT, popularity REAL, adult INTEGER)"
+            )
+
+            count = 0
+            connection.execute("BEGIN")
+            for batch in _read_batches(source, name_field):
+                connection.executemany("INSERT INTO staging VALUES (?, ?, ?, ?)", batch)
+                count += len(batch)
+
+            connection.execute(f"DROP TABLE IF EXISTS {table}_new")
+            connection.execute(
+                f"CREATE VIRTUAL TABLE {table}_new USING fts5("
+                f"name, tmdb_id UNINDEXED, popularity UNINDEXED, adult UNINDEXED, "
+                f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+            connection.execute(
+                f"INSERT INTO {table}_new (rowid, name, tmdb_id, popularity, adult) "
+                f"SELECT ROW_NUMBER() OVER (ORDER BY popularity DESC, tmdb_id), name, tmdb_id, popularity, adult "
+                f"FROM staging"
+            )
+            connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+            connection.execute("COMMIT")
+            connection.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        return count
+
+def _table(kind):
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind: {kind}")
+    return f"{kind}_titles"
+
+
+def _match_expression(query):
+    # Quote every term so user input cannot use FTS5 syntax, and prefix-match the last one.
+    terms = [term.replace('"', '""') for term in query.split()]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+
+def _read_batches(source, name_field):
+    opener = gzip.open if source.endswith(".gz") else open
+    batch = []
+    with opener(source, "rt", encoding="utf-8") as lines:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping malformed export line: %r", line[:200])
+                continue
+            name = record.get(name_field)
+            if not name or "id" not in record:
+                continue
+            batch.append((record["id"], name, record.get("popularity") or 0, int(bool(record.get("adult")))))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+search_index_cli = AppGroup("search-index", help="Manage the local TMDb search index.")
+
+
+@search_index_cli.command("ingest")
+@click.argument("kind", type=click.Choice(sorted(KINDS)))
+@click.argument("source", type=click.Path(exists=True, dir_okay=False))
+def ingest_command(kind, source):
+    """Load a TMDb daily ID export file (e.g. movie_ids_10_18_2026.json.gz) into the index."""
+    index = SearchIndex(current_app.config["SEARCH_INDEX_PATH"])
+    count = index.ingest(kind, source)
+    click.echo(f"Indexed {count} {kind} titles from {source}.")
@@ -0,0 +1,156 @@
+import logging
+import sqlite3
+import time
+
+from app.sqlite_store import SQLiteConnections, transaction
+from app.tmdb_api.cache import CachedResponse
+
+logger = logging.getLogger(__name__)
+
+# Reads only refresh an entry's LRU position when it is older than this, to keep reads write-free.
+TOUCH_INTERVAL = 60
+# Seconds between sweeps for entries past their staleness bound; eviction by size does not wait for them.
+PRUNE_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    status_code INTEGER NOT NULL,
+    content BLOB NOT NULL,
+    content_type TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS ix_entries_stale_until ON entries (stale_until);
+CREATE TABLE IF NOT EXISTS meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total_bytes INTEGER NOT NULL,
+    pruned_at REAL NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES (0, (SELECT COALESCE(SUM(size), 0) FROM entries), 0);
+"""
+
+
+class SharedCache:
+    """Second cache tier kept in a SQLite file shared by every worker on the host.
+
+    It survives restarts and deploys, so a cold worker starts with warm catalog
+    data. Entries carry wall-clock TTL metadata and the file is kept under
+    `max_bytes` by evicting the least recently accessed entries; a one-row
+    `meta` table keeps the running size, so writes never scan the table.
+    Errors are logged and treated as misses, so a broken file never fails a
+    request.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._connections = SQLiteConnections(path, SCHEMA)
+
+    def get(self, key, allow_stale=False):
+        try:
+            row = self._connections.get().execute(
+                "SELECT status_code, content, content_type, stored_at, expires_at, stale_until, accessed_at "
+                "FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is None or now >= (row[5] if allow_stale else row[4]):
+                self.misses += 1
+                return None
+            if now - row[6] > TOUCH_INTERVAL:
+                self._connections.get().execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            self.errors += 1
+            logger.exception("Shared cache read failed")
+            return None
+
+        self.hits += 1
+        return _to_entry(row, now)
+
+    def set(self, key, entry):
+        size = len(entry.content) + len(key)
+        if size > self.max_bytes:
+            return False
+
+        now = time.time()
+        # Entries use monotonic time, which means nothing to another process; store wall-clock times.
+        offset = now - time.monotonic()
+        try:
+            connection = self._connections.get()
+            with transaction(connection):
+                replaced = connection.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, entry.status_code, entry.content, entry.content_type, entry.stored_at + offset,
+                     entry.expires_at + offset, entry.stale_until + offset, size, now)
+                )
+                _add_bytes(connection, size - (replaced[0] if replaced else 0))
+                self._evict(connection, now)
+        except sqlite3.Error:
+            self.errors += 1
+            logger.exception("Shared cache write failed")
+            return False
+        return True
+
+    def stats(self):
+        try:
+            entries, size = self._connections.get().execute(
+                "SELECT (SELECT COUNT(*) FROM entries), total_bytes FROM meta"
+            ).fetchone()
+        except sqlite3.Error:
+            entries = size = None
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+    def _evict(self, connection, now):
+        total, pruned_at = connection.execute("SELECT total_bytes, pruned_at FROM meta").fetchone()
+        if now - pruned_at >= PRUNE_INTERVAL:
+            expired = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries WHERE stale_until <= ?", (now,)
+            ).fetchone()[0]
+            connection.execute("DELETE FROM entries WHERE stale_until <= ?", (now,))
+            connection.execute("UPDATE meta SET pruned_at = ?", (now,))
+            total -= expired
+            _add_bytes(connection, -expired)
+
+        while total > self.max_bytes:
+            oldest = connection.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at LIMIT 32"
+            ).fetchall()
+            if not oldest:
+                break
+            freed = 0
+            for key, size in oldest:
+                connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                freed += size
+                if total - freed <= self.max_bytes:
+                    break
+            total -= freed
+            _add_bytes(connection, -freed)
+
+
+def _add_bytes(connection, delta):
+    if delta:
+        connection.execute("UPDATE meta SET total_bytes = total_bytes + ?", (delta,))
+
+
+def _to_entry(row, now):
+    status_code, content, content_type, stored_at, expires_at, stale_until, _ = row
+    offset = time.monotonic() - now
+    entry = CachedResponse(status_code, content, content_type, stored_at=stored_at + offset)
+    entry.expires_at = expires_at + offset
+    entry.stale_until = stale_until + offset
+    return entry
@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# How often a worker waiting for another worker's lock file checks it again, in seconds.
+LOCK_POLL_INTERVAL = 0.02
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for it and receive the same result (or exception).
+
+    When `lock_dir` is set, the running caller also takes an exclusive file lock
+    derived from the key, so workers on the same host take turns. This only
+    coalesces fetches if `fn` first looks in a cache shared by the workers.
+    Keys are hashed onto a fixed number of lock files to keep the directory
+    bounded, so unrelated keys occasionally share one; a caller therefore waits
+    at most `lock_timeout` seconds for the lock and then runs `fn` regardless.
+    """
+
+    def __init__(self, lock_dir=None, lock_stripes=4096, lock_timeout=10):
+        self.lock_dir = lock_dir
+        self.lock_stripes = lock_stripes
+        self.lock_timeout = lock_timeout
+        self.executed = 0
+        self.coalesced = 0
+        self.lock_timeouts = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self._worker_lock(key):
+                call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight(),
+            "lock_timeouts": self.lock_timeouts,
+        }
+
+    def _worker_lock(self, key):
+        if not self.lock_dir:
+            return nullcontext()
+        stripe = int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16) % self.lock_stripes
+        return self._file_lock(os.path.join(self.lock_dir, f"{stripe:04d}.lock"))
+
+    @contextmanager
+    def _file_lock(self, path):
+        import fcntl  # POSIX only; only needed when cross-worker coalescing is enabled
+
+        with open(path, "a") as lock_file:
+            deadline = time.monotonic() + self.lock_timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        # A slow fetch (or an unrelated key on the same stripe) holds it; go without.
+                        self.lock_timeouts += 1
+                        logger.warning("Gave up waiting for %s after %ss", path, self.lock_timeout)
+                        locked = False
+                        break
+                    time.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
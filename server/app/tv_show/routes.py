@@ -1,15 +1,16 @@
-import requests
+from datetime import date, timedelta
 from flask import jsonify, request
 from urllib.parse import unquote
 
-from app import db
+from app import db, tmdb
+from app.tmdb_api import DETAIL_TTL, ENDED_SEASON_TTL, LIST_TTL, SEARCH_TIMEOUT, TV_APPENDABLE, TRENDING_TTL, TRENDING_MAX_STALE, append_to_response
 from app.tv_show import bp
-from config import Config
-from app.models import TVShowState
+from app.etag import conditional_on_state_version
+from app.models import TVShowState, bump_state_version, upsert_states
+from app.pagination import InvalidCursor, keyset_page, wants_page
 
 @bp.route('/tv-shows/popular', methods=['GET'])
 def get_popular_shows():
-    token = Config.ACCESS_TOKEN
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
@@ -30,49 +31,26 @@ def get_popular_shows():
     if first_air_date_lte:
         params["first_air_date.lte"] = first_air_date_lte
     
-    url = "https://api.themoviedb.org/3/discover/tv"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    path = "/discover/tv"
     
     # Filter out None values from params dictionary
     filtered_params = {k: v for k, v in params.items() if v is not None}
     
-    response = requests.get(url, headers=headers, params=filtered_params)
-    
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=filtered_params, ttl=LIST_TTL, fields=request.args.get('fields'))
     
 @bp.route('/tv-shows/airing-today', methods=['GET'])
 def airing_tv_shows():
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = "https://api.themoviedb.org/3/tv/airing_today"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
+    path = "/tv/airing_today"
     
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=params, ttl=LIST_TTL, fields=request.args.get('fields'))
 
 @bp.route('/tv-shows/top-rated', methods=['GET'])
 def get_top_rated_movies():
-    token = Config.ACCESS_TOKEN
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
@@ -93,95 +71,94 @@ def get_top_rated_movies():
     if first_air_date_lte:
         params["first_air_date.lte"] = first_air_date_lte
     
-    url = "https://api.themoviedb.org/3/discover/tv"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    path = "/discover/tv"
     
     # Filter out None values from params
     filtered_params = {k: v for k, v in params.items() if v is not None and v != ''}        
     
-    response = requests.get(url, headers=headers, params=filtered_params)
-    
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        print("Error Response:", response.json())
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=filtered_params, ttl=LIST_TTL, fields=request.args.get('fields'))
 
 @bp.route('/tv-shows/trending', methods=['GET'])
 def get_trending_shows():
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = "https://api.themoviedb.org/3/trending/tv/day"
+    path = "/trending/tv/day"
     
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=params, ttl=TRENDING_TTL, max_stale=TRENDING_MAX_STALE, fields=request.args.get('fields'))
     
 @bp.route("/tv-shows/search", methods=["GET"])
 def search():
-    token = Config.ACCESS_TOKEN
-
     params = {
         "query": request.args.get("query", ""),
         "page": request.args.get('page', 1),
         "include_adult": request.args.get('include_adult', 'true'),
     }
 
-    url = "https://api.themoviedb.org/3/search/tv"
+    path = "/search/tv"
 
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
+    return tmdb.search("tv", path, params, fields=request.args.get('fields'), timeout=SEARCH_TIMEOUT)
+    
+@bp.route('/tv-show/<int:show_id>', methods=['GET'])
+def get_movie_details(show_id):
+    params = {
+        "language": request.args.get('language', 'en-US'),
     }
 
-    response = requests.get(url, headers=headers, params=params)
+    # Bundle sub-resources (e.g. `include=videos,recommendations`) into the one upstream request.
+    try:
+        params["append_to_response"] = append_to_response(request.args.get('include'), TV_APPENDABLE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if response.status_code == 200:
-        json_data = response.json()
-        return jsonify(json_data)  # Return only the 'results' array
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    path = f"/tv/{show_id}"
+
+    return tmdb.proxy(path, params=params, ttl=DETAIL_TTL, fields=request.args.get('fields'))
     
-@bp.route('/tv-show/<int:show_id>', methods=['GET'])
-def get_movie_details(show_id):
-    token = Config.ACCESS_TOKEN
+# A season or episode is considered settled once this long has passed since it last aired.
+SETTLED_AFTER = timedelta(days=30)
+
+def has_finished_airing(air_dates):
+    if not air_dates or None in air_dates:
+        return False
+    try:
+        last_aired = max(date.fromisoformat(air_date) for air_date in air_dates)
+    except (TypeError, ValueError):
+        return False
+    return last_aired <= date.today() - SETTLED_AFTER
 
+def season_ttl(response):
+    episodes = response.json().get('episodes') or []
+    air_dates = [episode.get('air_date') or None for episode in episodes]
+    return ENDED_SEASON_TTL if has_finished_airing(air_dates) else DETAIL_TTL
+
+def episode_ttl(response):
+    air_date = response.json().get('air_date') or None
+    return ENDED_SEASON_TTL if has_finished_airing([air_date]) else DETAIL_TTL
+
+@bp.route('/tv-show/<int:show_id>/season/<int:season_number>', methods=['GET'])
+def get_season_details(show_id, season_number):
+    # Seasons are fetched one at a time, as the client opens them, and cached per language.
     params = {
         "language": request.args.get('language', 'en-US'),
     }
 
-    url = f'https://api.themoviedb.org/3/tv/{show_id}'
+    path = f"/tv/{show_id}/season/{season_number}"
+
+    return tmdb.proxy(path, params=params, ttl=season_ttl, fields=request.args.get('fields'))
 
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
+@bp.route('/tv-show/<int:show_id>/season/<int:season_number>/episode/<int:episode_number>', methods=['GET'])
+def get_episode_details(show_id, season_number, episode_number):
+    params = {
+        "language": request.args.get('language', 'en-US'),
     }
 
-    response = requests.get(url, headers=headers, params=params)
+    path = f"/tv/{show_id}/season/{season_number}/episode/{episode_number}"
+
+    return tmdb.proxy(path, params=params, ttl=episode_ttl, fields=request.args.get('fields'))
 
-    if response.status_code == 200:
-        json_data = response.json()
-        return jsonify(json_data)  # Return only the 'results' array
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
-    
 @bp.route('/set_tv_show_state', methods=['POST'])
 def set_tv_show_state():
     data = request.get_json()
@@ -195,20 +172,14 @@ def set_tv_show_state():
         return jsonify({'error': 'Missing required parameters'}), 400
 
     try:
-        existing_state = TVShowState.query.filter_by(user_id=user_id, tv_show_id=tv_show_id).first()
-        if existing_state:
-            existing_state.state = state
-            existing_state.title = title
-            existing_state.image_path = image
-        else:
-            new_state = TVShowState(
-                user_id=user_id, 
-                tv_show_id=tv_show_id, 
-                state=state, 
-                title=title, 
-                image_path=image
-            )
-            db.session.add(new_state)
+        upsert_states(TVShowState, 'tv_show_id', [{
+            'user_id': user_id,
+            'tv_show_id': tv_show_id,
+            'state': state,
+            'title': title,
+            'image_path': image
+        }])
+        bump_state_version(user_id)
         db.session.commit()
         return jsonify({'message': 'TV show state updated successfully'}), 200
     except Exception as e:
@@ -216,6 +187,7 @@ def set_tv_show_state():
         return jsonify({'error': str(e)}), 500
     
 @bp.route('/get_tv_show_states/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_tv_show_states(user_id):
     try:
         tv_show_states = TVShowState.query.filter_by(user_id=user_id).all()
@@ -227,39 +199,52 @@ def get_tv_show_states(user_id):
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/tv-watchlist/completed/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_completed_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'Completed')
 
 @bp.route('/tv-watchlist/watching/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_watching_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'Watching')
 
 @bp.route('/tv-watchlist/plan-to-watch/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_plan_to_watch_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'Plan to Watch')
 
 @bp.route('/tv-watchlist/on-hold/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_on_hold_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'On Hold')
 
 @bp.route('/tv-watchlist/dropped/<int:user_id>', methods=['GET'])
+@conditional_on_state_version
 def get_dropped_watchlist(user_id):
     return get_watchlist_by_state(user_id, 'Dropped')
 
+def serialize_state(item):
+    return {
+        'id': item.id,
+        'user_id': item.user_id,
+        'tv_show_id': item.tv_show_id,
+        'state': item.state,
+        'title': item.title,
+        'image_path': item.image_path
+    }
+
 def get_watchlist_by_state(user_id, state):
     try:
-        watchlist = TVShowState.query.filter_by(user_id=user_id, state=state).all()
-        result = []
-        for item in watchlist:
-            result.append({
-                'id': item.id,
-                'user_id': item.user_id,
-                'tv_show_id': item.tv_show_id,
-                'state': item.state,
-                'title': item.title,
-                'image_path': item.image_path
-            })
-        return jsonify(result), 200
+        query = TVShowState.query.filter_by(user_id=user_id, state=state)
+
+        # Clients that pass `limit` or `cursor` get the list a page at a time.
+        if wants_page():
+            watchlist, next_cursor = keyset_page(query, TVShowState, state)
+            return jsonify({'results': [serialize_state(item) for item in watchlist], 'next_cursor': next_cursor}), 200
+
+        return jsonify([serialize_state(item) for item in query.all()]), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -281,6 +266,7 @@ def remove_from_watchlist(state, user_id, tv_show_id):
         tv_show_state = TVShowState.query.filter_by(user_id=user_id, tv_show_id=tv_show_id, state=state).first()
         if tv_show_state:
             db.session.delete(tv_show_state)
+            bump_state_version(user_id)
             db.session.commit()
             return jsonify({'message': 'TV show removed successfully'}), 200
         else:
@@ -291,46 +277,22 @@ def remove_from_watchlist(state, user_id, tv_show_id):
     
 @bp.route('/tv-show/recommendations/<int:series_id>', methods=['GET'])
 def get_recommendations(series_id):
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = f"https://api.themoviedb.org/3/tv/{series_id}/recommendations"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    path = f"/tv/{series_id}/recommendations"
     
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code
+    return tmdb.proxy(path, params=params, ttl=DETAIL_TTL, fields=request.args.get('fields'))
     
 @bp.route('/tv-show/video/<int:series_id>', methods=['GET'])
 def get_video(series_id):
-    token = Config.ACCESS_TOKEN
-    
     params = {
         "language": request.args.get('language', 'en-US'),
         "page": request.args.get('page', 1),
     }
     
-    url = f"https://api.themoviedb.org/3/tv/{series_id}/videos"
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
+    path = f"/tv/{series_id}/videos"
     
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({"error": "Unable to fetch data from TMDb"}), response.status_code    
\ No newline at end of file
+    return tmdb.proxy(path, params=params, ttl=DETAIL_TTL)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+
+class SessionUser(UserMixin):
+    """The fields of a user that sessions need, cached in place of the full row."""
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def __repr__(self):
+        return f'{self.username}'
+
+
+class UserStore:
+    """Thread-safe TTL cache of SessionUsers by id, bounded to `max_entries` (least recently used go first)."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user):
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+class UserCache:
+    """Flask extension backing the Flask-Login user loader with a UserStore.
+
+    Sessions only need a user's id and username, so `load` answers from memory
+    and the users table is read once per user and TTL. Entries are dropped
+    when a user is deleted or renamed through the ORM, both at flush and again
+    once the transaction commits, so a concurrent reload cannot re-cache the
+    old row. Other workers pick up such changes when their entry expires.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["user_cache"] = UserStore(app.config["USER_CACHE_TTL"], app.config["USER_CACHE_MAX_ENTRIES"])
+
+        from app.models import User
+        if not event.contains(User, "after_update", _user_updated):
+            event.listen(User, "after_update", _user_updated)
+            event.listen(User, "after_delete", _user_deleted)
+            event.listen(Session, "after_commit", _session_committed)
+
+    @property
+    def store(self):
+        return current_app.extensions["user_cache"]
+
+    def load(self, user_id):
+        from app import db
+        from app.models import User
+
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        user = self.store.get(user_id)
+        if user is None:
+            row = db.get_or_404(User, user_id)
+            user = SessionUser(row.id, row.username)
+            self.store.set(user)
+        return user
+
+    def invalidate(self, user_id):
+        self.store.invalidate(user_id)
+
+    def stats(self):
+        return self.store.stats()
+
+
+def _user_updated(mapper, connection, target):
+    if inspect(target).attrs.username.history.has_changes():
+        _invalidate_on_commit(target)
+
+
+def _user_deleted(mapper, connection, target):
+    _invalidate_on_commit(target)
+
+
+def _invalidate_on_commit(target):
+    _invalidate([target.id])
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("invalidated_users", set()).add(target.id)
+
+
+def _session_committed(session):
+    _invalidate(session.info.pop("invalidated_users", ()))
+
+
+def _invalidate(user_ids):
+    if not user_ids or not has_app_context():
+        return
+    store = current_app.extensions.get("user_cache")
+    if store is not None:
+        for user_id in user_ids:
+            store.invalidate(user_id)
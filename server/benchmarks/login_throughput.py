@@ -0,0 +1,105 @@
+"""Login throughput benchmark.
+
+Runs a login storm against an in-memory app while another set of clients makes
+cheap non-login requests, once with hashing effectively unbounded (one hashing
+thread per concurrent login, as when hashing ran on the request threads) and
+once with the configured bounded pool. Prints login throughput and the latency
+of the other requests for both.
+
+    cd server && python -m benchmarks.login_throughput --logins 200 --concurrency 16
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models import User
+from config import TestConfig
+
+# Answered with a 400 before any TMDb request, so it stands in for a cheap catalog request.
+OTHER_URL = '/api/movies/550?include=bogus'
+
+
+def run(hash_workers, logins, concurrency, other_clients):
+    class BenchmarkConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'check_same_thread': False}}
+        RATELIMIT_ENABLED = False
+        PASSWORD_HASH_WORKERS = hash_workers
+        PASSWORD_HASH_QUEUE_SIZE = logins
+
+    app = create_app(config=BenchmarkConfig)
+    with app.app_context():
+        db.create_all()
+        password = generate_password_hash('benchmark', method=BenchmarkConfig.PASSWORD_HASH_METHOD, salt_length=16)
+        db.session.add(User(username='bench', email='bench@example.com', password=password))
+        db.session.commit()
+
+    remaining = iter(range(logins))
+    lock = threading.Lock()
+    done = threading.Event()
+    statuses = []
+    latencies = []
+
+    def login_loop():
+        client = app.test_client()
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            response = client.post('/api/login', json={'username': 'bench', 'password': 'benchmark'})
+            statuses.append(response.status_code)
+
+    def other_loop():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get(OTHER_URL)
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    others = [threading.Thread(target=other_loop) for _ in range(other_clients)]
+    for thread in others:
+        thread.start()
+
+    started = time.perf_counter()
+    storm = [threading.Thread(target=login_loop) for _ in range(concurrency)]
+    for thread in storm:
+        thread.start()
+    for thread in storm:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    done.set()
+    for thread in others:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'logins_per_second': len(statuses) / elapsed,
+        'failed_logins': sum(status != 200 for status in statuses),
+        'other_p50_ms': statistics.median(latencies) * 1000,
+        'other_p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--other-clients', type=int, default=4)
+    parser.add_argument('--hash-workers', type=int, default=TestConfig.PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+
+    for label, workers in (('unbounded', args.concurrency), ('bounded', args.hash_workers)):
+        result = run(workers, args.logins, args.concurrency, args.other_clients)
+        print(f"{label:>9} ({workers} hashing threads): {result['logins_per_second']:.1f} logins/s, "
+              f"{result['failed_logins']} failed, other requests p50 {result['other_p50_ms']:.1f} ms, "
+              f"p95 {result['other_p95_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 from datetime import timedelta
 
@@ -13,6 +14,17 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL") or f'sqlite:///{os.path.join(basedir, "app.db")}'
     FRONTEND_ENDPOINT = os.getenv("FRONTEND_ENDPOINT")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1").lower() in ["true", "1", "yes"]
+    # Lock file serializing startup migrations across workers (Postgres uses an advisory lock instead)
+    MIGRATE_LOCK_PATH = os.getenv("MIGRATE_LOCK_PATH") or os.path.join(tempfile.gettempdir(), "bingequest-migrate.lock")
+
+    LIBRARY_BATCH_MAX_ITEMS = int(os.getenv("LIBRARY_BATCH_MAX_ITEMS") or 500)
+    WATCHLIST_PAGE_SIZE = int(os.getenv("WATCHLIST_PAGE_SIZE") or 50)
+    WATCHLIST_MAX_PAGE_SIZE = int(os.getenv("WATCHLIST_MAX_PAGE_SIZE") or 200)
+
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # Bearer token for /api/metrics; the endpoint is off when unset
+
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE") or 1024)  # Bytes; smaller bodies are sent as is
 
     # Settion settings
     SESSION_COOKIE_HTTPONLY = True
@@ -30,17 +42,64 @@ class Config:
     # Email settings
     MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
     MAIL_PORT = int(os.getenv("MAIL_PORT") or 25)
-    MAIL_USE_TLS = os.getenv("MAIL_USE_TLS", "0").lower() in ["true", "1", "yes"]
+    # STARTTLS before logging in; only turn off for a local relay that takes no password
+    MAIL_USE_TLS = os.getenv("MAIL_USE_TLS", "1").lower() in ["true", "1", "yes"]
     RECIPIENT_EMAIL = os.getenv("RECIPIENT_GMAIL")
-    EMAIL_PASSWORD = os.getenv("GMAIL_PASSWORD")
+    EMAIL_PASSWORD = os.getenv("GMAIL_PASSWORD")  # Login is skipped when unset
+    MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE") or 100)  # Messages waiting before /contact answers 503
+    MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE") or 20)  # Messages sent per batch over one connection
+    MAIL_ENQUEUE_TIMEOUT = float(os.getenv("MAIL_ENQUEUE_TIMEOUT") or 0.5)  # Seconds to wait for queue space
+    MAIL_IDLE_TIMEOUT = float(os.getenv("MAIL_IDLE_TIMEOUT") or 30)  # Close the SMTP connection after this idle time
 
     # API settings
     API_KEY = os.getenv("API_KEY")
     ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 
+    # TMDb client settings
+    TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+    TMDB_POOL_SIZE = int(os.getenv("TMDB_POOL_SIZE") or 10)  # Keep-alive connections per worker
+    TMDB_CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT") or 3.05)  # Seconds
+    TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT") or 10)  # Read timeout in seconds
+    TMDB_RETRIES = int(os.getenv("TMDB_RETRIES") or 2)  # Retries for failed GETs
+    TMDB_RETRY_BACKOFF = float(os.getenv("TMDB_RETRY_BACKOFF") or 0.2)  # Base backoff in seconds
+    TMDB_BREAKER_FAILURE_RATIO = float(os.getenv("TMDB_BREAKER_FAILURE_RATIO") or 0.5)
+    TMDB_BREAKER_MIN_CALLS = int(os.getenv("TMDB_BREAKER_MIN_CALLS") or 10)
+    TMDB_BREAKER_RESET_TIMEOUT = float(os.getenv("TMDB_BREAKER_RESET_TIMEOUT") or 30)  # Seconds
+    TMDB_STALE_IF_ERROR = int(os.getenv("TMDB_STALE_IF_ERROR") or 24 * 60 * 60)  # Keep stale entries for outages
+    TMDB_CACHE_MAX_BYTES = int(os.getenv("TMDB_CACHE_MAX_BYTES") or 64 * 1024 * 1024)  # 0 disables the cache
+    TMDB_SHARED_CACHE_PATH = os.getenv("TMDB_SHARED_CACHE_PATH")  # SQLite file shared by the workers on a host
+    TMDB_SHARED_CACHE_MAX_BYTES = int(os.getenv("TMDB_SHARED_CACHE_MAX_BYTES") or 256 * 1024 * 1024)
+    TMDB_REFRESH_WORKERS = int(os.getenv("TMDB_REFRESH_WORKERS") or 2)  # Threads refreshing stale entries
+    TMDB_FANOUT_WORKERS = int(os.getenv("TMDB_FANOUT_WORKERS") or 8)  # Threads for aggregate endpoints
+    # Directory of lock files letting workers wait for each other's fetch of a URL and then read it from
+    # the shared cache tier; ignored unless TMDB_SHARED_CACHE_PATH is set.
+    TMDB_LOCK_DIR = os.getenv("TMDB_LOCK_DIR")
+    TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT") or 40)  # Outbound requests per second, 0 disables
+    TMDB_RATE_LIMIT_BURST = int(os.getenv("TMDB_RATE_LIMIT_BURST") or 0) or None  # Defaults to the rate
+    TMDB_RATE_LIMIT_MAX_WAIT = float(os.getenv("TMDB_RATE_LIMIT_MAX_WAIT") or 5)  # Seconds a request may queue
+    TMDB_RATE_LIMIT_PATH = os.getenv("TMDB_RATE_LIMIT_PATH")  # SQLite file to share the limit across workers
+    # Password hashes are re-made with these parameters on login; include the cost, e.g. "scrypt:32768:8:1".
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD") or "pbkdf2:sha256:600000"
+    PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH") or 16)
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS") or 2)  # Concurrent hashes per worker
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE") or 32)  # Waiting hashes before a 503
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL") or 60)  # Seconds a worker trusts a cached session user
+    USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES") or 10000)
+    RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "1").lower() in ["true", "1", "yes"]
+    RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT") or "300/minute"  # Per client and blueprint
+    # Overrides per blueprint, e.g. "movies=120/minute,auth=20/minute"
+    RATELIMIT_BLUEPRINT_LIMITS = os.getenv("RATELIMIT_BLUEPRINT_LIMITS") or "auth=60/minute"
+    RATELIMIT_STORAGE_PATH = os.getenv("RATELIMIT_STORAGE_PATH")  # SQLite file to share counters across workers
+    # Number of reverse proxies in front of the app; anonymous clients are keyed by the address they forwarded
+    RATELIMIT_TRUSTED_PROXIES = int(os.getenv("RATELIMIT_TRUSTED_PROXIES") or 0)
+    SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH")  # SQLite file built by `flask search-index ingest`
+
 class TestConfig(Config):
     TESTING = True
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'  # Using SQLite for testing
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SECRET_KEY = 'testsecretkey'
\ No newline at end of file
+    SECRET_KEY = 'testsecretkey'
+    FRONTEND_ENDPOINT = 'http://localhost:3000'
+    ACCESS_TOKEN = 'test-access-token'
+    METRICS_TOKEN = 'test-metrics-token'
\ No newline at end of file
@@ -4,6 +4,8 @@ FRONTEND_ENDPOINT="<FRONTEND_URL>"
 
 # Database configuration
 DATABASE_URL='<DATABASE_URL>'
+MIGRATE_ON_STARTUP=1
+MIGRATE_LOCK_PATH='/tmp/bingequest-migrate.lock'
 
 # Email configuration
 MAIL_SERVER='<MAIL_SERVER>'
@@ -15,3 +17,43 @@ GMAIL_PASSWORD='<GMAIL_PASSWORD>'
 # API configuration
 ACCESS_TOKEN='<TMBD_ACCESS_TOKEN>'
 
+TMDB_POOL_SIZE=10
+TMDB_TIMEOUT=10
+TMDB_CACHE_MAX_BYTES=67108864
+TMDB_REFRESH_WORKERS=2
+TMDB_LOCK_DIR='/tmp/bingequest-tmdb-locks'
+LIBRARY_BATCH_MAX_ITEMS=500
+WATCHLIST_PAGE_SIZE=50
+WATCHLIST_MAX_PAGE_SIZE=200
+TMDB_FANOUT_WORKERS=8
+COMPRESS_MIN_SIZE=1024
+TMDB_SHARED_CACHE_PATH='/tmp/bingequest-tmdb-cache.sqlite3'
+TMDB_SHARED_CACHE_MAX_BYTES=268435456
+SEARCH_INDEX_PATH='/tmp/bingequest-search-index.sqlite3'
+TMDB_RATE_LIMIT=40
+TMDB_RATE_LIMIT_BURST=40
+TMDB_RATE_LIMIT_MAX_WAIT=5
+TMDB_RATE_LIMIT_PATH='/tmp/bingequest-tmdb-rate-limit.sqlite3'
+TMDB_CONNECT_TIMEOUT=3.05
+TMDB_RETRIES=2
+TMDB_RETRY_BACKOFF=0.2
+TMDB_BREAKER_FAILURE_RATIO=0.5
+TMDB_BREAKER_MIN_CALLS=10
+TMDB_BREAKER_RESET_TIMEOUT=30
+TMDB_STALE_IF_ERROR=86400
+RATELIMIT_ENABLED=1
+RATELIMIT_DEFAULT='300/minute'
+RATELIMIT_BLUEPRINT_LIMITS='auth=60/minute,movies=120/minute,tv_shows=120/minute'
+RATELIMIT_STORAGE_PATH='/tmp/bingequest-rate-limit.sqlite3'
+RATELIMIT_TRUSTED_PROXIES=1
+PASSWORD_HASH_METHOD='pbkdf2:sha256:600000'
+PASSWORD_SALT_LENGTH=16
+PASSWORD_HASH_WORKERS=2
+PASSWORD_HASH_QUEUE_SIZE=32
+USER_CACHE_TTL=60
+USER_CACHE_MAX_ENTRIES=10000
+MAIL_QUEUE_SIZE=100
+MAIL_BATCH_SIZE=20
+MAIL_ENQUEUE_TIMEOUT=0.5
+MAIL_IDLE_TIMEOUT=30
+METRICS_TOKEN='<METRICS_TOKEN>'
@@ -0,0 +1,58 @@
+"""Add watchlist state indexes.
+
+Revision ID: 393843e38d3e
+Revises: c3c519e435f0
+Create Date: 2026-10-18 10:02:41.513208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '393843e38d3e'
+down_revision = 'c3c519e435f0'
+branch_labels = None
+depends_on = None
+
+# (table, title id column) pairs covered by this migration.
+STATE_TABLES = [
+    ('movie_states', 'movie_id'),
+    ('tv_show_states', 'tv_show_id'),
+]
+
+
+def upgrade():
+    # A user can only hold one state per title; keep the most recent row of any duplicates
+    # so that the unique constraint can be created.
+    for table, title_column in STATE_TABLES:
+        op.execute(sa.text(
+            f'DELETE FROM {table} WHERE id NOT IN '
+            f'(SELECT MAX(id) FROM {table} GROUP BY user_id, {title_column})'
+        ))
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY does not lock out writes, but cannot run inside a transaction.
+        with op.get_context().autocommit_block():
+            for table, title_column in STATE_TABLES:
+                op.create_index(f'ix_{table}_user_id_state', table, ['user_id', 'state'],
+                                postgresql_concurrently=True)
+                op.create_index(f'uq_{table}_user_id_{title_column}', table, ['user_id', title_column],
+                                unique=True, postgresql_concurrently=True)
+                # Promoting an existing unique index to a constraint is a metadata-only change.
+                op.execute(
+                    f'ALTER TABLE {table} ADD CONSTRAINT uq_{table}_user_id_{title_column} '
+                    f'UNIQUE USING INDEX uq_{table}_user_id_{title_column}'
+                )
+    else:
+        for table, title_column in STATE_TABLES:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.create_index(f'ix_{table}_user_id_state', ['user_id', 'state'])
+                batch_op.create_unique_constraint(f'uq_{table}_user_id_{title_column}', ['user_id', title_column])
+
+
+def downgrade():
+    for table, title_column in STATE_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'uq_{table}_user_id_{title_column}', type_='unique')
+            batch_op.drop_index(f'ix_{table}_user_id_state')
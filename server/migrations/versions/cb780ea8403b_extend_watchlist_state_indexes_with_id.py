@@ -0,0 +1,41 @@
+"""Extend watchlist state indexes with id.
+
+Revision ID: cb780ea8403b
+Revises: 393843e38d3e
+Create Date: 2026-10-18 11:27:05.884130
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cb780ea8403b'
+down_revision = '393843e38d3e'
+branch_labels = None
+depends_on = None
+
+STATE_TABLES = ['movie_states', 'tv_show_states']
+
+
+def upgrade():
+    # Keyset pagination seeks on (user_id, state, id > cursor) ordered by id; having id in
+    # the index lets the database read a page straight off it instead of sorting the list.
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for table in STATE_TABLES:
+                op.create_index(f'ix_{table}_user_id_state_id', table, ['user_id', 'state', 'id'],
+                                postgresql_concurrently=True)
+                op.drop_index(f'ix_{table}_user_id_state', table_name=table, postgresql_concurrently=True)
+    else:
+        for table in STATE_TABLES:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.create_index(f'ix_{table}_user_id_state_id', ['user_id', 'state', 'id'])
+                batch_op.drop_index(f'ix_{table}_user_id_state')
+
+
+def downgrade():
+    for table in STATE_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(f'ix_{table}_user_id_state', ['user_id', 'state'])
+            batch_op.drop_index(f'ix_{table}_user_id_state_id')
@@ -1,8 +1,10 @@
+import os
+
 import sqlalchemy
-from flask_migrate import upgrade
 
 from app import create_app, db
 from app.models import User
+from app.schema import check_schema_version, upgrade_on_startup
 
 app = create_app()
 
@@ -10,10 +12,23 @@ app = create_app()
 def make_shell_context():
     return {'sqlalchemy': sqlalchemy, 'db': db, 'User': User}
 
-@app.before_request
-def apply_migrations():
+def prepare_database():
+    """Migrate once when the process starts rather than before every request.
+
+    Each worker runs this, so the upgrade is serialized across them.
+    Deployments that run `flask db upgrade` as a release step can set
+    MIGRATE_ON_STARTUP=0.
+    """
     with app.app_context():
-        upgrade()  # Apply migrations automatically
+        if app.config["MIGRATE_ON_STARTUP"]:
+            upgrade_on_startup()
+        check_schema_version(refresh=True)
+
+
+# The `flask` CLI imports this module too, and an upgrade there would run ahead of commands such as
+# `flask db downgrade`. Under the CLI (`flask run` included) migrations are left to `flask db upgrade`.
+if os.environ.get("FLASK_RUN_FROM_CLI") != "true":
+    prepare_database()
 
 if __name__ == "__main__":
-    app.run()
\ No newline at end of file
+    app.run()
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models import User
+from config import TestConfig
+
+
+class DatabaseTestConfig(TestConfig):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # Cheap, to keep the tests fast
+    RATELIMIT_ENABLED = False
+    # Let the test client send the session cookie back over plain http://localhost.
+    SESSION_COOKIE_DOMAIN = None
+    SESSION_COOKIE_SECURE = False
+    REMEMBER_COOKIE_SECURE = False
+
+
+METRICS_HEADERS = {'Authorization': f'Bearer {TestConfig.METRICS_TOKEN}'}
+
+
+def wait_for(condition, timeout=2):
+    """Poll `condition` until it holds, for work finishing on a background thread."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def config():
+    """The config class `app` is created with; modules override this fixture to change it."""
+    return DatabaseTestConfig
+
+
+# Tests that need an app context request `app_context` as well: requests made while a context is
+# pushed share its `g`, where Flask-Login keeps the loaded user.
+@pytest.fixture
+def app(config):
+    app = create_app(config=config)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    """User 1, `testuser`, with the password `hunter22`."""
+    with app.app_context():
+        password = generate_password_hash('hunter22', method=app.config['PASSWORD_HASH_METHOD'], salt_length=16)
+        db.session.add(User(id=1, username='testuser', email='test@example.com', password=password))
+        db.session.commit()
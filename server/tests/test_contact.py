@@ -0,0 +1,175 @@
+import email
+import socket
+import threading
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app import mail
+from app.contact.email import _STOP, MailQueue, MailQueueFull
+from tests.conftest import DatabaseTestConfig, wait_for
+
+
+class RecordingHandler:
+    """aiosmtpd handler keeping every delivered message and the connection it came in on."""
+
+    def __init__(self):
+        self.messages = []
+        self.release = threading.Event()
+        self.release.set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.release.wait(5)  # Lets a test hold the worker on a message
+        self.messages.append((session.peer, envelope.mail_from, envelope.rcpt_tos, envelope.content))
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield controller
+    handler.release.set()
+    controller.stop()
+
+
+@pytest.fixture
+def config(smtp_server):
+    class ContactTestConfig(DatabaseTestConfig):
+        MAIL_SERVER = smtp_server.hostname
+        MAIL_PORT = smtp_server.port
+        MAIL_USE_TLS = False
+        RECIPIENT_EMAIL = 'owner@example.com'
+        EMAIL_PASSWORD = None  # The stand-in server has no AUTH, so login is skipped
+        MAIL_QUEUE_SIZE = 2
+        MAIL_ENQUEUE_TIMEOUT = 0.05
+
+    return ContactTestConfig
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context():
+        yield app
+        mail.queue.close()
+
+
+def test_contact_messages_share_one_smtp_connection(app, smtp_server):
+    client = app.test_client()
+    for i in range(5):
+        response = client.post('/api/contact', json={'name': f'Sender {i}', 'email': f's{i}@example.com',
+                                                     'message': 'Hello'})
+        assert response.status_code == 200
+        wait_for(lambda: mail.stats()['sent'] == i + 1)
+
+    messages = smtp_server.handler.messages
+    assert len(messages) == 5
+    assert len({peer for peer, *_ in messages}) == 1
+    assert messages[0][1] == 's0@example.com'
+    assert messages[0][2] == ['owner@example.com']
+    assert 'Name: Sender 0' in email.message_from_bytes(messages[0][3]).get_payload(decode=True).decode()
+    assert mail.stats()['connections'] == 1
+
+
+@pytest.mark.parametrize('payload', [
+    {'name': 'x', 'message': 'y'},
+    {'name': 'x', 'email': 'x@example.com', 'message': ['y']},
+    {'name': '', 'email': 'x@example.com', 'message': 'y'},
+    {'name': 'x', 'email': 'not-an-address', 'message': 'y'},
+    {'name': 'x', 'email': 'x@example.com\r\nRCPT TO:<a@example.com>', 'message': 'y'},
+    ['x', 'x@example.com', 'y'],
+])
+def test_contact_rejects_invalid_messages(app, payload):
+    response = app.test_client().post('/api/contact', json=payload)
+
+    assert response.status_code == 400
+    assert mail.stats()['queued'] == 0 and mail.stats()['sent'] == 0
+
+
+def test_full_queue_applies_backpressure(app, smtp_server):
+    smtp_server.handler.release.clear()
+    client = app.test_client()
+
+    def post():
+        return client.post('/api/contact', json={'name': 'Spam', 'email': 'spam@example.com', 'message': 'x'})
+
+    assert post().status_code == 200
+    wait_for(lambda: mail.stats()['queued'] == 0)  # The worker is now stuck delivering the first message
+
+    # Two more fit in the queue; the rest are turned away.
+    assert [post().status_code for _ in range(4)] == [200, 200, 503, 503]
+    assert post().headers['Retry-After'] == '30'
+    assert mail.stats()['rejected'] == 3
+
+    smtp_server.handler.release.set()
+    wait_for(lambda: mail.stats()['sent'] == 3)
+    assert len(smtp_server.handler.messages) == 3
+
+
+def test_worker_reconnects_after_the_server_drops_the_connection(smtp_server):
+    queue = MailQueue(smtp_server.hostname, smtp_server.port, use_tls=False)
+    queue.put('a@example.com', 'owner@example.com', 'Subject: 1\n\nfirst')
+    wait_for(lambda: queue.stats()['sent'] == 1)
+
+    queue._connection.sock.shutdown(socket.SHUT_RDWR)  # Simulate the server timing out the idle connection
+    queue.put('b@example.com', 'owner@example.com', 'Subject: 2\n\nsecond')
+    wait_for(lambda: queue.stats()['sent'] == 2)
+    queue.close()
+
+    assert queue.stats()['connections'] == 2
+    assert queue.stats()['failed'] == 0
+
+
+def test_worker_survives_a_message_it_cannot_send(smtp_server):
+    queue = MailQueue(smtp_server.hostname, smtp_server.port, use_tls=False)
+    queue.put('a@example.com', [None], 'Subject: 1\n\nbad recipient')
+    queue.put('b@example.com', 'owner@example.com', 'Subject: 2\n\nsecond')
+    wait_for(lambda: queue.stats()['sent'] == 1)
+    queue.close()
+
+    assert queue.stats()['failed'] == 1
+    assert [mail_from for _, mail_from, *_ in smtp_server.handler.messages] == ['b@example.com']
+
+
+def test_put_restarts_a_dead_worker(smtp_server):
+    queue = MailQueue(smtp_server.hostname, smtp_server.port, use_tls=False)
+    queue.put('a@example.com', 'owner@example.com', 'Subject: 1\n\nfirst')
+    wait_for(lambda: queue.stats()['sent'] == 1)
+    queue._queue.put(_STOP)  # Ends the worker without clearing it, as a crash would
+    wait_for(lambda: not queue._worker.is_alive())
+
+    queue.put('b@example.com', 'owner@example.com', 'Subject: 2\n\nsecond')
+    wait_for(lambda: queue.stats()['sent'] == 2)
+    queue.close()
+
+
+def test_put_raises_when_queue_stays_full(smtp_server):
+    smtp_server.handler.release.clear()
+    queue = MailQueue(smtp_server.hostname, smtp_server.port, use_tls=False, queue_size=1,
+                      enqueue_timeout=0.01)
+    queue.put('a@example.com', 'owner@example.com', 'Subject: 1\n\nfirst')
+    wait_for(lambda: queue.stats()['queued'] == 0)
+    queue.put('b@example.com', 'owner@example.com', 'Subject: 2\n\nsecond')
+
+    with pytest.raises(MailQueueFull):
+        queue.put('c@example.com', 'owner@example.com', 'Subject: 3\n\nthird')
+    smtp_server.handler.release.set()
+    queue.close()
+    assert queue.stats()['sent'] == 2
+
+
+def test_password_is_not_sent_to_a_server_without_starttls(smtp_server):
+    queue = MailQueue(smtp_server.hostname, smtp_server.port, username='owner@example.com', password='secret')
+    queue.put('a@example.com', 'owner@example.com', 'Subject: 1\n\nfirst')
+    wait_for(lambda: queue.stats()['failed'] == 1)
+    queue.close()
+
+    assert queue.stats()['sent'] == 0
+    assert smtp_server.handler.messages == []
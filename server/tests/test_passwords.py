@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app import db, hasher
+from app.models import User
+from app.passwords import HashPool, HasherBusy
+
+
+def test_register_hashes_with_configured_parameters(app, app_context):
+    response = app.test_client().post('/api/register', json={
+        'username': 'newuser', 'email': 'new@example.com', 'password': 'hunter22'
+    })
+
+    assert response.status_code == 201
+    user = db.session.execute(db.select(User).where(User.username == 'newuser')).scalar()
+    assert user.password.startswith('pbkdf2:sha256:1000$')
+    assert check_password_hash(user.password, 'hunter22')
+
+
+def test_login_upgrades_hashes_made_with_old_parameters(app, app_context):
+    old_hash = generate_password_hash('hunter22', method='pbkdf2:sha256:500', salt_length=8)
+    db.session.add(User(username='olduser', email='old@example.com', password=old_hash))
+    db.session.commit()
+    client = app.test_client()
+
+    assert client.post('/api/login', json={'username': 'olduser', 'password': 'wrong'}).status_code == 401
+    assert db.session.execute(db.select(User.password)).scalar() == old_hash
+
+    assert client.post('/api/login', json={'username': 'olduser', 'password': 'hunter22'}).status_code == 200
+    upgraded = db.session.execute(db.select(User.password)).scalar()
+    assert upgraded.startswith('pbkdf2:sha256:1000$')
+    assert len(upgraded.split('$')[1]) == 16
+    assert check_password_hash(upgraded, 'hunter22')
+    assert hasher.stats()['rehashed'] == 1
+
+    # Once upgraded, later logins leave the hash alone.
+    client.post('/api/login', json={'username': 'olduser', 'password': 'hunter22'})
+    assert db.session.execute(db.select(User.password)).scalar() == upgraded
+
+
+def test_pool_rejects_work_beyond_its_queue():
+    pool = HashPool('pbkdf2:sha256:1000', 16, workers=1, queue_size=0)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_hash(password, **kwargs):
+        started.set()
+        release.wait(2)
+        return 'hash'
+
+    worker = threading.Thread(target=pool._run, args=(blocking_hash, 'x'))
+    worker.start()
+    started.wait(2)
+    with pytest.raises(HasherBusy):
+        pool.hash('y')
+    release.set()
+    worker.join()
+
+    assert pool.stats()['rejected'] == 1
+    assert pool.verify(pool.hash('y'), 'y')
+
+
+def test_needs_rehash():
+    pool = HashPool('scrypt:32768:8:1', 16)
+    assert pool.needs_rehash('pbkdf2:sha256:600000$abcdefghijklmnop$00')
+    assert pool.needs_rehash('scrypt:32768:8:1$short$00')
+    assert pool.needs_rehash('not-a-hash')
+    assert not pool.needs_rehash('scrypt:32768:8:1$abcdefghijklmnop$00')
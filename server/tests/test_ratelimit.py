@@ -0,0 +1,102 @@
+import pytest
+
+from app import create_app
+from app.ratelimit import MemoryStore, SQLiteStore, parse_limit, parse_limits, sliding_window
+from tests.conftest import METRICS_HEADERS, DatabaseTestConfig
+
+
+class LimiterTestConfig(DatabaseTestConfig):
+    RATELIMIT_ENABLED = True
+    RATELIMIT_DEFAULT = '3/minute'
+    RATELIMIT_BLUEPRINT_LIMITS = 'metrics=1/minute'
+
+# Rejected before reaching TMDb, so these tests need no upstream.
+MOVIE_URL = '/api/movies/550?include=bogus'
+
+
+@pytest.fixture
+def config():
+    return LimiterTestConfig
+
+
+def test_parse_limits():
+    assert parse_limit('60/minute') == (60, 60)
+    assert parse_limit('5 / seconds') == (5, 1)
+    assert parse_limits('movies=10/hour, auth=1/day') == {'movies': (10, 3600), 'auth': (1, 86400)}
+    for invalid in ('10/fortnight', '0/minute', '-1/minute'):
+        with pytest.raises(ValueError):
+            parse_limit(invalid)
+    with pytest.raises(ValueError):
+        parse_limits('movies=0/minute')
+
+
+def test_sliding_window_weights_previous_window():
+    # Halfway through the current window, half of the previous window's requests still count.
+    assert sliding_window(previous=4, current=0, window=60, now=30, limit=3) == (True, 0)
+    assert sliding_window(previous=4, current=2, window=60, now=30, limit=3) == (False, 15)
+    assert sliding_window(previous=0, current=3, window=60, now=30, limit=3) == (False, 30)
+
+
+@pytest.mark.parametrize('make_store', [lambda tmp_path: MemoryStore(),
+                                        lambda tmp_path: SQLiteStore(str(tmp_path / 'limits.sqlite3'))])
+def test_stores_count_per_key_and_window(tmp_path, make_store):
+    store = make_store(tmp_path)
+    assert [store.hit('a', 2, 60, 120)[0] for _ in range(3)] == [True, True, False]
+    assert store.hit('b', 2, 60, 120) == (True, 0)
+
+    # Early in the next window the previous one still weighs in; a window later it is gone.
+    assert store.hit('a', 2, 60, 180)[0] is False
+    assert store.hit('a', 2, 60, 300) == (True, 0)
+
+
+def test_over_limit_requests_get_429_with_retry_after(app):
+    client = app.test_client()
+    assert [client.get(MOVIE_URL).status_code for _ in range(3)] == [400, 400, 400]
+
+    response = client.get(MOVIE_URL)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json() == {'error': 'Too many requests'}
+
+    # Other blueprints and other clients have their own budgets.
+    assert client.get('/api/metrics', headers=METRICS_HEADERS).status_code == 200
+    assert client.get('/api/metrics', headers=METRICS_HEADERS).status_code == 429
+    other = client.get(MOVIE_URL, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 400
+
+
+def test_logged_in_users_are_limited_by_user_id(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    for _ in range(3):
+        client.get(MOVIE_URL, environ_base={'REMOTE_ADDR': '10.0.0.3'})
+
+    response = client.get(MOVIE_URL, environ_base={'REMOTE_ADDR': '10.0.0.4'})
+    assert response.status_code == 429
+    assert app.extensions['limiter'].stats()['rejected'] == 1
+
+
+def test_clients_behind_trusted_proxies_are_limited_by_forwarded_address():
+    class ProxiedLimiterConfig(LimiterTestConfig):
+        RATELIMIT_TRUSTED_PROXIES = 1
+
+    client = create_app(config=ProxiedLimiterConfig).test_client()
+    proxy = {'REMOTE_ADDR': '10.0.0.1'}
+
+    def get(forwarded_for):
+        return client.get(MOVIE_URL, environ_base=proxy, headers={'X-Forwarded-For': forwarded_for}).status_code
+
+    assert [get('203.0.113.5') for _ in range(4)] == [400, 400, 400, 429]
+    # Another client behind the same proxy has its own budget, and a spoofed leftmost entry is ignored.
+    assert get('198.51.100.7') == 400
+    assert get('198.51.100.8, 203.0.113.5') == 429
+
+
+def test_shared_store_is_shared_between_workers(tmp_path):
+    class SharedLimiterConfig(LimiterTestConfig):
+        RATELIMIT_STORAGE_PATH = str(tmp_path / 'limits.sqlite3')
+
+    workers = [create_app(config=SharedLimiterConfig).test_client() for _ in range(2)]
+    statuses = [workers[i % 2].get('/api/metrics', headers=METRICS_HEADERS).status_code for i in range(2)]
+    assert statuses == [200, 429]
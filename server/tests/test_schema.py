@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import sqlalchemy as sa
+from flask_migrate import upgrade
+
+from app import create_app, db
+from app.schema import check_schema_version, upgrade_on_startup
+from tests.conftest import DatabaseTestConfig
+
+
+@pytest.fixture
+def config(tmp_path):
+    class SchemaTestConfig(DatabaseTestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'schema.db'}"
+        MIGRATE_LOCK_PATH = str(tmp_path / 'migrate.lock')
+
+    return SchemaTestConfig
+
+
+# Not the conftest app: these tests need a file database that migrations, not create_all, build.
+@pytest.fixture
+def app(config):
+    app = create_app(config=config)
+    with app.app_context():
+        yield app
+        db.engine.dispose()
+
+
+def test_schema_check_reports_pending_migrations(app):
+    status = check_schema_version()
+
+    assert status["current"] == []
+    assert not status["up_to_date"]
+
+
+def test_schema_check_is_cached_until_refreshed(app):
+    assert not check_schema_version()["up_to_date"]
+
+    upgrade()
+
+    # Still the cached answer from before the upgrade.
+    assert not check_schema_version()["up_to_date"]
+    assert check_schema_version(refresh=True)["up_to_date"]
+
+
+def test_state_indexes_migration_deduplicates_and_adds_constraints(app):
+    upgrade(revision='c3c519e435f0')
+    with db.engine.begin() as connection:
+        connection.execute(sa.text("INSERT INTO users (id, username, email, password) VALUES (1, 'u', 'u@example.com', 'x')"))
+        for state in ('Watching', 'Completed'):
+            connection.execute(sa.text(
+                "INSERT INTO movie_states (user_id, movie_id, state) VALUES (1, 550, :state)"), {"state": state})
+
+    upgrade()
+
+    with db.engine.connect() as connection:
+        rows = connection.execute(sa.text("SELECT state FROM movie_states")).all()
+    assert rows == [('Completed',)]
+
+    inspector = sa.inspect(db.engine)
+    for table, title_column in [('movie_states', 'movie_id'), ('tv_show_states', 'tv_show_id')]:
+        unique = [c['column_names'] for c in inspector.get_unique_constraints(table)]
+        indexes = [i['column_names'] for i in inspector.get_indexes(table)]
+        assert ['user_id', title_column] in unique
+        assert ['user_id', 'state', 'id'] in indexes
+
+
+def test_startup_upgrades_from_several_workers_run_one_at_a_time(config):
+    workers = [create_app(config=config) for _ in range(3)]
+
+    def start(worker):
+        with worker.app_context():
+            upgrade_on_startup()
+            status = check_schema_version(refresh=True)
+            db.engine.dispose()
+            return status
+
+    with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+        statuses = list(pool.map(start, workers))
+
+    assert all(status["up_to_date"] for status in statuses)
@@ -0,0 +1,29 @@
+import threading
+
+import pytest
+
+from app.sqlite_store import SQLiteConnections, transaction
+
+
+def test_connections_are_per_thread_and_bootstrap_the_schema(tmp_path):
+    connections = SQLiteConnections(str(tmp_path / 'nested' / 'store.sqlite3'), 'CREATE TABLE items (id INTEGER);')
+    others = []
+    thread = threading.Thread(target=lambda: others.append(connections.get()))
+    thread.start()
+    thread.join()
+
+    assert connections.get() is connections.get()
+    assert others[0] is not connections.get()
+    assert connections.get().execute("PRAGMA journal_mode").fetchone() == ('wal',)
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    connection = SQLiteConnections(str(tmp_path / 'store.sqlite3'), 'CREATE TABLE items (id INTEGER);').get()
+    with pytest.raises(RuntimeError):
+        with transaction(connection):
+            connection.execute("INSERT INTO items VALUES (1)")
+            raise RuntimeError()
+    with transaction(connection):
+        connection.execute("INSERT INTO items VALUES (2)")
+
+    assert connection.execute("SELECT id FROM items").fetchall() == [(2,)]
@@ -0,0 +1,699 @@
+import gzip
+import io
+import json
+import threading
+import time
+import pytest
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+import app.tmdb_api as tmdb_package
+import app.tmdb_api.shared_cache as shared_cache_module
+from app import create_app, tmdb
+from app.tmdb_api import DETAIL_TTL, ENDED_SEASON_TTL
+from app.tmdb_api.cache import CachedResponse, ResponseCache
+from app.tmdb_api.circuit_breaker import CircuitBreaker
+from app.tmdb_api.rate_limit import RateLimitExceeded, SharedTokenBucket, TokenBucket, retry_after_seconds
+from app.tmdb_api.search_index import SearchIndex
+from app.tmdb_api.shared_cache import SharedCache
+from app.tmdb_api.singleflight import SingleFlight
+from tests.conftest import METRICS_HEADERS, DatabaseTestConfig, wait_for
+
+
+class FakeTMDbAdapter(BaseAdapter):
+    """Transport adapter answering TMDb requests from a canned payload table."""
+
+    def __init__(self, payloads=None, delay=0):
+        super().__init__()
+        self.payloads = payloads or {}
+        self.delay = delay
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append((request, kwargs))
+        time.sleep(self.delay)
+        path = request.path_url.split('?')[0].replace('/3', '', 1)
+        status, payload = self.payloads.get(path, (404, {"status_message": "Not found"}))
+
+        response = Response()
+        response.status_code = status
+        response.raw = io.BytesIO(json.dumps(payload).encode('utf-8'))
+        response.headers['Content-Type'] = 'application/json;charset=utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+# The conftest app, with its context pushed for the whole test: `tmdb.client` belongs to the current app.
+@pytest.fixture
+def app(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def adapter(app):
+    adapter = FakeTMDbAdapter({
+        "/trending/movie/day": (200, {"page": 1, "results": [{"id": 1, "title": "Blondie"}]}),
+        "/movie/550": (200, {"id": 550, "title": "Fight Club"}),
+        "/search/movie": (200, {"page": 1, "results": [{"id": 550, "title": "Fight Club"}]}),
+    })
+    tmdb.client.session.mount("https://", adapter)
+    return adapter
+
+
+def test_client_is_shared_per_app(app):
+    assert tmdb.client is app.extensions['tmdb']
+    assert tmdb.client is tmdb.client
+
+
+def test_client_sends_auth_header_and_timeout(app, adapter):
+    response = app.test_client().get('/api/movies/trending?page=2')
+
+    assert response.status_code == 200
+    assert response.get_json()["results"][0]["title"] == "Blondie"
+
+    request, kwargs = adapter.requests[-1]
+    assert request.headers["Authorization"] == "Bearer test-access-token"
+    assert "page=2" in request.url
+    assert kwargs["timeout"] == (app.config["TMDB_CONNECT_TIMEOUT"], app.config["TMDB_TIMEOUT"])
+
+
+def test_upstream_error_is_forwarded(app, adapter):
+    response = app.test_client().get('/api/movies/1')
+
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "Unable to fetch data from TMDb"}
+
+
+def test_cache_evicts_least_recently_used_by_bytes():
+    cache = ResponseCache(max_bytes=100)
+    cache.set('a', CachedResponse(200, b'x' * 40, 'application/json', ttl=60))
+    cache.set('b', CachedResponse(200, b'x' * 40, 'application/json', ttl=60))
+    assert cache.get('a') is not None  # 'a' becomes the most recently used entry
+
+    cache.set('c', CachedResponse(200, b'x' * 40, 'application/json', ttl=60))
+
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.current_bytes <= cache.max_bytes
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_expires_entries_and_counts_misses():
+    cache = ResponseCache(max_bytes=1024)
+    cache.set('a', CachedResponse(200, b'{}', 'application/json', ttl=0))
+
+    assert cache.get('a') is None
+    assert cache.get('missing') is None
+    assert cache.stats()['misses'] == 2
+    assert cache.current_bytes == 0
+
+
+def test_cache_rejects_entries_larger_than_budget():
+    cache = ResponseCache(max_bytes=10)
+    assert not cache.set('a', CachedResponse(200, b'x' * 20, 'application/json', ttl=60))
+    assert len(cache) == 0
+
+
+def test_cache_key_is_canonical(app):
+    client = tmdb.client
+    assert client.cache_key('/movie/1', {'page': 1, 'language': 'en-US'}) == \
+        client.cache_key('movie/1', {'language': 'en-US', 'page': '1', 'region': None})
+
+
+def test_catalog_route_is_served_from_cache(app, adapter):
+    test_client = app.test_client()
+    first = test_client.get('/api/movies/trending')
+    second = test_client.get('/api/movies/trending')
+
+    assert first.get_json() == second.get_json()
+    assert len(adapter.requests) == 1
+
+    stats = test_client.get('/api/metrics', headers=METRICS_HEADERS).get_json()['tmdb']['cache']
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_errors_are_not_cached(app, adapter):
+    test_client = app.test_client()
+    test_client.get('/api/movies/1')
+    test_client.get('/api/movies/1')
+
+    assert len(adapter.requests) == 2
+
+
+def test_passthrough_forwards_upstream_bytes(app, adapter):
+    response = app.test_client().get('/api/movies/550')
+
+    assert response.data == json.dumps({"id": 550, "title": "Fight Club"}).encode('utf-8')
+    assert response.content_type == 'application/json;charset=utf-8'
+
+
+def test_uncached_routes_are_streamed(app, adapter):
+    response = app.test_client().get('/api/movies/search?query=fight')
+
+    assert response.is_streamed
+    assert response.get_json()["results"][0]["id"] == 550
+    assert adapter.requests[-1][1]["stream"] is True
+
+
+def test_stale_trending_page_is_served_while_refreshing(app, adapter):
+    test_client = app.test_client()
+    test_client.get('/api/movies/trending')
+
+    # Expire the entry and change what TMDb returns.
+    key = tmdb.client.cache_key('/trending/movie/day', {'language': 'en-US', 'page': 1})
+    tmdb.client.cache.get(key).expires_at = time.monotonic() - 1
+    adapter.payloads["/trending/movie/day"] = (200, {"page": 1, "results": [{"id": 2, "title": "Heat"}]})
+
+    stale = test_client.get('/api/movies/trending')
+    assert stale.get_json()["results"][0]["title"] == "Blondie"
+
+    wait_for(lambda: tmdb.client.refreshes == 1)
+    fresh = test_client.get('/api/movies/trending')
+    assert fresh.get_json()["results"][0]["title"] == "Heat"
+    assert tmdb.client.cache.stats()['stale_hits'] == 1
+
+
+def test_entries_past_their_staleness_bound_are_refetched(app, adapter):
+    test_client = app.test_client()
+    test_client.get('/api/movies/trending')
+
+    key = tmdb.client.cache_key('/trending/movie/day', {'language': 'en-US', 'page': 1})
+    entry = tmdb.client.cache.get(key)
+    entry.expires_at = entry.stale_until = time.monotonic() - 1
+
+    test_client.get('/api/movies/trending')
+    assert len(adapter.requests) == 2
+    assert tmdb.client.refreshes == 0
+
+
+def test_concurrent_identical_misses_share_one_upstream_request(app, adapter):
+    adapter.delay = 0.2
+    client = tmdb.client
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: client.get('/movie/550', {'language': 'en-US'}, ttl=60), range(8)))
+
+    assert len(adapter.requests) == 1
+    assert all(result.json()["id"] == 550 for result in results)
+    assert client.flight.stats()["coalesced"] + client.cache.stats()["hits"] == 7
+
+
+def test_singleflight_shares_errors_with_waiters():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, 'key', failing)
+        started.wait()
+        follower = pool.submit(flight.do, 'key', lambda: 'unused')
+
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    assert flight.stats() == {"executed": 1, "coalesced": 1, "in_flight": 0, "lock_timeouts": 0}
+
+
+def test_singleflight_serializes_through_lock_files(tmp_path):
+    flight = SingleFlight(lock_dir=str(tmp_path), lock_stripes=4)
+
+    assert flight.do('key', lambda: 42) == 42
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_singleflight_stops_waiting_for_a_held_lock_file(tmp_path):
+    holder = SingleFlight(lock_dir=str(tmp_path), lock_stripes=1)
+    waiter = SingleFlight(lock_dir=str(tmp_path), lock_stripes=1, lock_timeout=0.1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(holder.do, 'slow', slow)
+        started.wait()
+        # Another key on the same stripe runs once the timeout passes instead of waiting for the slow fetch.
+        assert waiter.do('other', lambda: 42) == 42
+        release.set()
+
+    assert waiter.stats()["lock_timeouts"] == 1
+
+
+def test_lock_dir_coalesces_fetches_across_workers_through_the_shared_cache(tmp_path):
+    class LockedWorkerConfig(DatabaseTestConfig):
+        TMDB_SHARED_CACHE_PATH = str(tmp_path / 'tmdb-cache.sqlite3')
+        TMDB_LOCK_DIR = str(tmp_path)
+
+    adapters = []
+    clients = []
+    for _ in range(2):  # Two apps stand in for two workers on one host
+        worker = create_app(config=LockedWorkerConfig)
+        adapter = FakeTMDbAdapter({"/movie/550": (200, {"id": 550, "title": "Fight Club"})}, delay=0.2)
+        worker.extensions['tmdb'].session.mount("https://", adapter)
+        adapters.append(adapter)
+        clients.append(worker.test_client())
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(clients[0].get, '/api/movies/550')
+        wait_for(lambda: adapters[0].requests)
+        second = pool.submit(clients[1].get, '/api/movies/550')
+        responses = [first.result(), second.result()]
+
+    assert all(response.get_json()["title"] == "Fight Club" for response in responses)
+    assert [len(adapter.requests) for adapter in adapters] == [1, 0]
+
+
+def test_lock_dir_is_ignored_without_the_shared_cache(tmp_path):
+    class LockOnlyConfig(DatabaseTestConfig):
+        TMDB_LOCK_DIR = str(tmp_path)
+
+    worker = create_app(config=LockOnlyConfig)
+    assert worker.extensions['tmdb'].flight.lock_dir is None
+
+
+def test_home_overview_fetches_sections_concurrently(app, adapter):
+    adapter.payloads.update({
+        "/movie/now_playing": (200, {"results": [{"id": 1}]}),
+        "/tv/top_rated": (200, {"results": [{"id": 2}]}),
+        "/movie/top_rated": (500, {"status_message": "Internal error"}),
+    })
+    adapter.delay = 0.3
+    tmdb.client.retries = 0  # Retries are covered separately; keep the failing section to one request
+
+    started = time.monotonic()
+    response = app.test_client().get('/api/home/overview')
+    elapsed = time.monotonic() - started
+
+    document = response.get_json()
+    assert response.status_code == 200
+    assert document["in_theatres"]["results"][0]["id"] == 1
+    assert document["show_top_rated"]["results"][0]["id"] == 2
+    assert document["movie_top_rated"] == {"error": "Unable to fetch data from TMDb"}
+    assert len(adapter.requests) == 3
+    assert elapsed < 0.8
+
+
+def test_detail_include_bundles_sub_resources_into_one_request(app, adapter):
+    test_client = app.test_client()
+    first = test_client.get('/api/movies/550?include=videos,recommendations')
+    second = test_client.get('/api/movies/550?include=recommendations,videos,videos')
+
+    assert first.status_code == second.status_code == 200
+    assert len(adapter.requests) == 1
+    assert 'append_to_response=recommendations%2Cvideos' in adapter.requests[0][0].url
+
+
+def test_detail_include_rejects_unknown_sub_resources(app, adapter):
+    response = app.test_client().get('/api/people/287?include=videos')
+
+    assert response.status_code == 400
+    assert adapter.requests == []
+
+
+def test_seasons_are_cached_longer_once_they_have_ended(app, adapter):
+    adapter.payloads.update({
+        "/tv/1399/season/1": (200, {"episodes": [{"air_date": "2011-04-17"}, {"air_date": "2011-06-19"}]}),
+        "/tv/1399/season/9": (200, {"episodes": [{"air_date": "2011-04-17"}, {"air_date": None}]}),
+    })
+    test_client = app.test_client()
+
+    assert test_client.get('/api/tv-show/1399/season/1').status_code == 200
+    assert test_client.get('/api/tv-show/1399/season/9').status_code == 200
+    assert test_client.get('/api/tv-show/1399/season/1').status_code == 200
+
+    def lifetime(season):
+        entry = tmdb.client.cache.get(tmdb.client.cache_key(f'/tv/1399/season/{season}', {'language': 'en-US'}))
+        return entry.expires_at - entry.stored_at
+
+    assert len(adapter.requests) == 2
+    assert lifetime(1) == pytest.approx(ENDED_SEASON_TTL)
+    assert lifetime(9) == pytest.approx(DETAIL_TTL)
+
+
+def test_cached_bodies_keep_their_compressed_variant(app, adapter, monkeypatch):
+    adapter.payloads["/trending/movie/day"] = (200, {"results": [{"id": i, "overview": "x" * 100} for i in range(50)]})
+    test_client = app.test_client()
+
+    calls = []
+    original = tmdb_package.compress
+    monkeypatch.setattr(tmdb_package, 'compress', lambda body, encoding: calls.append(encoding) or original(body, encoding))
+
+    first = test_client.get('/api/movies/trending', headers={'Accept-Encoding': 'gzip'})
+    second = test_client.get('/api/movies/trending', headers={'Accept-Encoding': 'gzip'})
+    plain = test_client.get('/api/movies/trending')
+
+    assert first.headers['Content-Encoding'] == second.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(second.data))["results"][49]["id"] == 49
+    assert 'Content-Encoding' not in plain.headers
+    assert calls == ['gzip']
+
+    stats = tmdb.client.cache.stats()
+    assert stats['bytes'] > len(plain.data) + len(second.data)
+
+
+def test_small_bodies_are_not_compressed(app, adapter):
+    response = app.test_client().get('/api/movies/550', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()["id"] == 550
+
+
+def test_card_projection_trims_list_results_and_is_cached(app, adapter):
+    adapter.payloads["/trending/movie/day"] = (200, {"page": 1, "total_pages": 3, "results": [
+        {"id": 1, "title": "Blondie", "overview": "...", "backdrop_path": "/b.jpg", "poster_path": "/p.jpg"}
+    ]})
+    test_client = app.test_client()
+
+    first = test_client.get('/api/movies/trending?fields=card').get_json()
+    second = test_client.get('/api/movies/trending?fields=card').get_json()
+    full = test_client.get('/api/movies/trending?fields=full').get_json()
+
+    assert first == second == {"page": 1, "total_pages": 3, "results": [{"id": 1, "title": "Blondie", "poster_path": "/p.jpg"}]}
+    assert "overview" in full["results"][0]
+    assert len(adapter.requests) == 1
+
+    projected_key = tmdb.client.cache_key('/trending/movie/day', {'language': 'en-US', 'page': 1}) + '#fields=' + \
+        ','.join(sorted(tmdb_package.projection.PRESETS['card']))
+    assert projected_key in tmdb.client.cache
+
+
+def test_explicit_field_lists_project_details(app, adapter):
+    test_client = app.test_client()
+
+    assert test_client.get('/api/movies/550?fields=title').get_json() == {"title": "Fight Club"}
+    assert test_client.get('/api/movies/550?fields=title;drop').status_code == 400
+
+
+def test_shared_cache_tier_is_shared_between_workers(tmp_path):
+    class SharedCacheConfig(DatabaseTestConfig):
+        TMDB_SHARED_CACHE_PATH = str(tmp_path / 'tmdb-cache.sqlite3')
+
+    adapters = []
+    for _ in range(2):  # Two apps stand in for two workers (or a worker before and after a restart)
+        worker = create_app(config=SharedCacheConfig)
+        adapter = FakeTMDbAdapter({"/movie/550": (200, {"id": 550, "title": "Fight Club"})})
+        worker.extensions['tmdb'].session.mount("https://", adapter)
+        adapters.append(adapter)
+
+        response = worker.test_client().get('/api/movies/550')
+        assert response.get_json()["title"] == "Fight Club"
+
+    assert [len(adapter.requests) for adapter in adapters] == [1, 0]
+
+
+def test_shared_cache_expires_and_evicts_by_size(tmp_path):
+    shared = SharedCache(str(tmp_path / 'cache.sqlite3'), max_bytes=250)
+    shared.set('a', CachedResponse(200, b'x' * 100, 'application/json', ttl=60))
+    shared.set('b', CachedResponse(200, b'x' * 100, 'application/json', ttl=60))
+    shared.set('expired', CachedResponse(200, b'{}', 'application/json', ttl=0))
+
+    assert shared.get('expired') is None
+    shared.set('c', CachedResponse(200, b'x' * 100, 'application/json', ttl=60))
+
+    assert shared.get('a') is None
+    assert shared.get('c').content == b'x' * 100
+    assert shared.get('c').is_fresh()
+    assert shared.stats()['bytes'] <= 250
+
+
+def test_shared_cache_keeps_a_running_size_and_prunes_expired_entries_periodically(tmp_path, monkeypatch):
+    shared = SharedCache(str(tmp_path / 'cache.sqlite3'), max_bytes=10_000)
+    shared.set('a', CachedResponse(200, b'x' * 100, 'application/json', ttl=600))
+    shared.set('a', CachedResponse(200, b'x' * 50, 'application/json', ttl=600))
+    shared.set('expired', CachedResponse(200, b'{}', 'application/json', ttl=0))
+    shared.set('b', CachedResponse(200, b'x' * 10, 'application/json', ttl=600))
+
+    # The expired entry waits for the next sweep.
+    assert (shared.stats()['entries'], shared.stats()['bytes']) == (3, 51 + 9 + 11)
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + shared_cache_module.PRUNE_INTERVAL)
+    shared.set('c', CachedResponse(200, b'x' * 10, 'application/json', ttl=600))
+    assert (shared.stats()['entries'], shared.stats()['bytes']) == (3, 51 + 11 + 11)
+
+
+def write_export(path, records):
+    with gzip.open(path, 'wt', encoding='utf-8') as export:
+        for record in records:
+            export.write(json.dumps(record) + '\n')
+    return str(path)
+
+
+def test_search_index_ranks_prefix_matches_by_popularity(tmp_path):
+    export = write_export(tmp_path / 'movie_ids.json.gz', [
+        {"adult": False, "id": 1, "original_title": "Star Wreck", "popularity": 0.6},
+        {"adult": False, "id": 11, "original_title": "Star Wars", "popularity": 80.2},
+        {"adult": False, "id": 13, "original_title": "Forrest Gump", "popularity": 50.0},
+        {"adult": True, "id": 99, "original_title": "Star Struck", "popularity": 90.0},
+        {"adult": False, "id": 1891, "original_title": "The Empire Strikes Back", "popularity": 30.1},
+    ])
+    index = SearchIndex(str(tmp_path / 'index.sqlite3'))
+
+    assert not index.is_ready('movie')
+    assert index.ingest('movie', export) == 5
+    assert index.is_ready('movie')
+
+    assert [r["id"] for r in index.search('movie', 'star')] == [11, 1]
+    assert [r["id"] for r in index.search('movie', 'STAR', include_adult=True)] == [99, 11, 1]
+    assert [r["title"] for r in index.search('movie', 'empire str')] == ["The Empire Strikes Back"]
+    assert index.search('movie', '"') == []
+    assert index.search('movie', 'star', limit=1)[0]["id"] == 11
+
+
+def test_typeahead_search_uses_index_and_falls_back_to_tmdb(tmp_path):
+    class SearchIndexConfig(DatabaseTestConfig):
+        SEARCH_INDEX_PATH = str(tmp_path / 'index.sqlite3')
+
+    app = create_app(config=SearchIndexConfig)
+    adapter = FakeTMDbAdapter({"/search/movie": (200, {"page": 1, "results": [{"id": 550, "title": "Fight Club"}]})})
+    app.extensions['tmdb'].session.mount("https://", adapter)
+    client = app.test_client()
+
+    # No index has been built yet, so TMDb answers.
+    assert client.get('/api/movies/search?query=star&typeahead=true').get_json()["results"][0]["id"] == 550
+
+    export = write_export(tmp_path / 'movie_ids.json.gz', [
+        {"adult": False, "id": 11, "original_title": "Star Wars", "popularity": 80.2},
+    ])
+    result = app.test_cli_runner().invoke(args=['search-index', 'ingest', 'movie', export])
+    assert 'Indexed 1 movie titles' in result.output
+
+    body = client.get('/api/movies/search?query=sta&typeahead=true').get_json()
+    assert body["source"] == "index"
+    assert body["results"] == [{"id": 11, "title": "Star Wars", "popularity": 80.2, "adult": False}]
+    assert len(adapter.requests) == 1
+
+    # Queries without local matches, later pages and regular searches still go upstream.
+    client.get('/api/movies/search?query=fight&typeahead=true')
+    client.get('/api/movies/search?query=sta&typeahead=true&page=2')
+    client.get('/api/movies/search?query=sta')
+    assert len(adapter.requests) == 4
+
+
+def test_token_bucket_queues_then_rejects():
+    bucket = TokenBucket(rate=20, burst=2, max_wait=0.2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+
+    assert 0.02 < bucket.acquire() < 0.2  # Waited for the next token instead of failing
+    assert bucket.stats()["throttled"] == 1
+
+    bucket.pause(1)
+    with pytest.raises(RateLimitExceeded):
+        bucket.acquire()
+    assert bucket.stats()["rejected"] == 1
+    assert bucket.stats()["paused_for"] > 0.5
+    assert bucket.stats()["waiting"] == 0
+
+
+def test_shared_token_bucket_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'rate-limit.sqlite3')
+    first = SharedTokenBucket(path, rate=1, burst=2, max_wait=0)
+    second = SharedTokenBucket(path, rate=1, burst=2, max_wait=0)
+
+    first.acquire()
+    second.acquire()
+    with pytest.raises(RateLimitExceeded):
+        first.acquire()
+
+    second.pause(30)
+    assert first.stats()["paused_for"] > 29
+
+
+def test_retry_after_accepts_seconds_and_dates():
+    assert retry_after_seconds("3") == 3
+    assert retry_after_seconds(None, default=1) == 1
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+
+class RateLimitedAdapter(FakeTMDbAdapter):
+    """Answers the first `limited` requests with 429 and a `Retry-After` header."""
+
+    def __init__(self, payloads, limited, retry_after):
+        super().__init__(payloads)
+        self.limited = limited
+        self.retry_after = retry_after
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if len(self.requests) <= self.limited:
+            response.status_code = 429
+            response.headers['Retry-After'] = self.retry_after
+        return response
+
+
+def test_client_retries_after_upstream_rate_limit(app):
+    adapter = RateLimitedAdapter({"/movie/550": (200, {"id": 550})}, limited=1, retry_after="0.1")
+    tmdb.client.session.mount("https://", adapter)
+
+    response = app.test_client().get('/api/movies/550')
+
+    assert response.status_code == 200
+    assert len(adapter.requests) == 2
+    stats = tmdb.stats()
+    assert stats["upstream_rate_limited"] == 1
+    assert stats["rate_limit"]["pauses"] == 1
+
+
+def test_long_retry_after_is_forwarded(app):
+    adapter = RateLimitedAdapter({"/movie/550": (200, {"id": 550})}, limited=1, retry_after="60")
+    tmdb.client.session.mount("https://", adapter)
+
+    response = app.test_client().get('/api/movies/550')
+
+    assert response.status_code == 429
+    assert len(adapter.requests) == 1
+
+
+class FlakyAdapter(FakeTMDbAdapter):
+    """Fails the first `failures` requests, with a status code or by raising `error`."""
+
+    def __init__(self, payloads, failures, status=503, error=None):
+        super().__init__(payloads)
+        self.failures = failures
+        self.status = status
+        self.error = error
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if len(self.requests) <= self.failures:
+            if self.error is not None:
+                raise self.error
+            response.status_code = self.status
+        return response
+
+
+def test_failed_gets_are_retried_with_backoff(app):
+    tmdb.client.retry_backoff = 0.01
+    adapter = FlakyAdapter({"/movie/550": (200, {"id": 550})}, failures=2, error=requests.ConnectTimeout())
+    tmdb.client.session.mount("https://", adapter)
+
+    assert app.test_client().get('/api/movies/550').status_code == 200
+    assert len(adapter.requests) == 3
+
+    adapter = FlakyAdapter({"/movie/13": (200, {"id": 13})}, failures=3, error=requests.ReadTimeout())
+    tmdb.client.session.mount("https://", adapter)
+
+    assert app.test_client().get('/api/movies/13').status_code == 504
+    assert len(adapter.requests) == 3
+
+
+def test_truncated_bodies_are_retried_and_count_once_for_the_breaker(app):
+    tmdb.client.retry_backoff = 0.01
+    tmdb.client.breaker = CircuitBreaker(min_calls=3)
+    adapter = FlakyAdapter({"/movie/550": (200, {"id": 550})}, failures=2,
+                           error=requests.exceptions.ChunkedEncodingError())
+    tmdb.client.session.mount("https://", adapter)
+
+    assert app.test_client().get('/api/movies/550').status_code == 200
+    assert len(adapter.requests) == 3
+    assert tmdb.stats()["circuit_breaker"]["failures"] == 0
+
+    adapter = FlakyAdapter({"/movie/13": (200, {"id": 13})}, failures=3,
+                           error=requests.exceptions.ContentDecodingError())
+    tmdb.client.session.mount("https://", adapter)
+
+    assert app.test_client().get('/api/movies/13').status_code == 502
+    assert tmdb.stats()["circuit_breaker"]["failures"] == 1
+    assert tmdb.stats()["circuit_breaker"]["state"] == "closed"
+
+
+def test_search_routes_use_a_shorter_read_timeout(app, adapter):
+    app.test_client().get('/api/movies/search?query=fight')
+
+    _, kwargs = adapter.requests[-1]
+    assert kwargs["timeout"] == (app.config["TMDB_CONNECT_TIMEOUT"], tmdb_package.SEARCH_TIMEOUT)
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_ratio=0.5, min_calls=4, reset_timeout=0.05)
+    for succeeded in (True, False, True, False):
+        assert breaker.allow()
+        if succeeded:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    assert breaker.stats()["state"] == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # A single trial request once the reset timeout has passed
+    assert not breaker.allow()
+    breaker.record_success()
+
+    assert breaker.stats()["state"] == "closed"
+    assert breaker.stats()["opened"] == 1
+
+
+def test_open_breaker_serves_stale_entries_without_calling_tmdb(app):
+    tmdb.client.retries = 0
+    tmdb.client.stale_if_error = 60
+    tmdb.client.breaker = CircuitBreaker(min_calls=2, reset_timeout=60)
+    adapter = FakeTMDbAdapter({"/movie/550": (200, {"id": 550})})
+    tmdb.client.session.mount("https://", adapter)
+    test_client = app.test_client()
+
+    assert test_client.get('/api/movies/550').status_code == 200
+    entry = tmdb.client.cache.peek(next(iter(tmdb.client.cache._entries)))
+    entry.expires_at = entry.stale_until = time.monotonic() - 1  # Well past its TTL
+
+    adapter.payloads["/movie/550"] = (500, {"status_message": "Internal error"})
+    adapter.payloads["/movie/13"] = (500, {"status_message": "Internal error"})
+    assert test_client.get('/api/movies/13').status_code == 500
+    response = test_client.get('/api/movies/550')
+    assert response.status_code == 200
+    assert response.get_json() == {"id": 550}
+    assert tmdb.stats()["circuit_breaker"]["state"] == "open"
+
+    sent = len(adapter.requests)
+    assert test_client.get('/api/movies/550').get_json() == {"id": 550}
+    assert test_client.get('/api/movies/13').status_code == 503
+    assert len(adapter.requests) == sent
+    assert tmdb.stats()["stale_fallbacks"] == 2
+
+
+def test_metrics_require_the_configured_token(app):
+    test_client = app.test_client()
+    assert test_client.get('/api/metrics').status_code == 401
+    assert test_client.get('/api/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert test_client.get('/api/metrics', headers={'Authorization': 'Bearer café'}).status_code == 401
+    assert test_client.get('/api/metrics', headers=METRICS_HEADERS).status_code == 200
+
+    app.config['METRICS_TOKEN'] = None
+    assert test_client.get('/api/metrics', headers=METRICS_HEADERS).status_code == 404
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import event
+
+from app import db, user_cache
+from app.models import User
+
+
+@pytest.fixture
+def client(client, user):
+    assert client.post('/api/login', json={'username': 'testuser', 'password': 'hunter22'}).status_code == 200
+    return client
+
+
+@pytest.fixture
+def user_queries(app):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if 'FROM users' in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_session_checks_are_served_from_memory(app, client, user_queries):
+    for _ in range(3):
+        response = client.get('/api/check-session')
+        assert response.get_json()['username'] == 'testuser'
+
+    assert len(user_queries) == 1
+    with app.app_context():
+        assert user_cache.stats()['hits'] == 2
+
+
+def test_username_change_invalidates_cached_user(app, client):
+    client.get('/api/check-session')
+
+    with app.app_context():
+        db.session.get(User, 1).username = 'renamed'
+        db.session.commit()
+        assert user_cache.stats()['invalidations'] == 1
+
+    assert client.get('/api/check-session').get_json()['username'] == 'renamed'
+
+
+def test_other_updates_keep_cached_user(app, client):
+    client.get('/api/check-session')
+
+    with app.app_context():
+        db.session.get(User, 1).state_version += 1
+        db.session.commit()
+        assert user_cache.stats()['invalidations'] == 0
+        assert user_cache.store.get(1) is not None
+
+
+def test_account_deletion_invalidates_cached_user(app, client):
+    client.get('/api/check-session')
+
+    assert client.delete('/api/delete-account').status_code == 200
+    with app.app_context():
+        assert user_cache.store.get(1) is None
+    assert client.get('/api/check-session').status_code == 404
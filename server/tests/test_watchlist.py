@@ -0,0 +1,161 @@
+import gzip
+import json
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.models import MovieState, TVShowState
+
+pytestmark = pytest.mark.usefixtures('app_context', 'user')
+
+
+def test_set_movie_state_inserts_then_updates_in_place(client):
+    client.post('/api/set_movie_state', json={
+        'user_id': 1, 'movie_id': 550, 'state': 'Watching', 'title': 'Fight Club', 'image': '/old.jpg'
+    })
+    response = client.post('/api/set_movie_state', json={
+        'user_id': 1, 'movie_id': 550, 'state': 'Completed', 'title': 'Fight Club', 'image': '/new.jpg'
+    })
+
+    assert response.status_code == 200
+    states = MovieState.query.all()
+    assert len(states) == 1
+    assert (states[0].state, states[0].image_path) == ('Completed', '/new.jpg')
+
+
+def test_set_tv_show_state_keeps_title_when_omitted(client):
+    client.post('/api/set_tv_show_state', json={
+        'user_id': 1, 'tv_show_id': 1399, 'state': 'Watching', 'title': 'Game of Thrones', 'image': '/got.jpg'
+    })
+    client.post('/api/set_tv_show_state', json={'user_id': 1, 'tv_show_id': 1399, 'state': 'Dropped'})
+
+    state = TVShowState.query.one()
+    assert (state.state, state.title, state.image_path) == ('Dropped', 'Game of Thrones', '/got.jpg')
+
+
+def test_set_movie_state_requires_parameters(client):
+    response = client.post('/api/set_movie_state', json={'user_id': 1, 'movie_id': 550})
+    assert response.status_code == 400
+
+
+def test_batch_applies_items_in_one_transaction(client):
+    client.post('/api/set_movie_state', json={'user_id': 1, 'movie_id': 550, 'state': 'Watching', 'title': 'Fight Club'})
+
+    response = client.post('/api/library/states', json={'user_id': 1, 'items': [
+        {'kind': 'movie', 'id': 550, 'state': 'Completed'},
+        {'kind': 'movie', 'id': 680, 'state': 'Plan to Watch', 'title': 'Pulp Fiction', 'image': '/pf.jpg'},
+        {'kind': 'tv', 'id': 1399, 'state': 'Watching', 'title': 'Game of Thrones'},
+        {'kind': 'tv', 'id': 1399, 'state': 'Completed', 'title': 'Game of Thrones'},
+        {'kind': 'book', 'id': 1, 'state': 'Completed'},
+        {'kind': 'movie', 'id': 13, 'state': 'Loved'},
+    ]})
+
+    assert response.status_code == 200
+    statuses = [result['status'] for result in response.get_json()['results']]
+    assert statuses == ['ok', 'ok', 'superseded', 'ok', 'error', 'error']
+
+    movies = {state.movie_id: state for state in MovieState.query.all()}
+    assert movies[550].state == 'Completed' and movies[550].title == 'Fight Club'
+    assert movies[680].image_path == '/pf.jpg'
+    assert [(s.tv_show_id, s.state) for s in TVShowState.query.all()] == [(1399, 'Completed')]
+
+
+def test_batch_rejects_oversized_requests(app, client):
+    app.config['LIBRARY_BATCH_MAX_ITEMS'] = 1
+    response = client.post('/api/library/states', json={'user_id': 1, 'items': [
+        {'kind': 'movie', 'id': 1, 'state': 'Completed'},
+        {'kind': 'movie', 'id': 2, 'state': 'Completed'},
+    ]})
+    assert response.status_code == 400
+
+
+def test_library_groups_movies_and_shows_by_state(client):
+    client.post('/api/library/states', json={'user_id': 1, 'items': [
+        {'kind': 'movie', 'id': 550, 'state': 'Completed', 'title': 'Fight Club'},
+        {'kind': 'movie', 'id': 680, 'state': 'Completed', 'title': 'Pulp Fiction'},
+        {'kind': 'tv', 'id': 1399, 'state': 'Watching', 'title': 'Game of Thrones'},
+    ]})
+
+    response = client.get('/api/library/1')
+    library = response.get_json()
+
+    assert response.status_code == 200
+    assert [item['movie_id'] for item in library['movies']['Completed']] == [550, 680]
+    assert library['tv_shows']['Watching'][0]['tv_show_id'] == 1399
+    assert library['movies']['Dropped'] == []
+    assert library['counts']['movies']['Completed'] == 2
+    assert library['counts']['tv_shows']['Watching'] == 1
+    assert library['counts']['total'] == 3
+
+
+def test_watchlist_pages_with_keyset_cursor(client):
+    client.post('/api/library/states', json={'user_id': 1, 'items': [
+        {'kind': 'movie', 'id': movie_id, 'state': 'Completed'} for movie_id in range(1, 6)
+    ] + [{'kind': 'movie', 'id': 99, 'state': 'Dropped'}]})
+
+    seen, cursor = [], None
+    while True:
+        query = f'?limit=2&cursor={cursor}' if cursor else '?limit=2'
+        page = client.get(f'/api/watchlist/completed/1{query}').get_json()
+        assert len(page['results']) <= 2
+        seen += [item['movie_id'] for item in page['results']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == [1, 2, 3, 4, 5]
+
+    # Unpaged requests keep returning the whole list.
+    assert len(client.get('/api/watchlist/completed/1').get_json()) == 5
+
+
+def test_watchlist_rejects_foreign_or_garbage_cursors(client):
+    client.post('/api/library/states', json={'user_id': 1, 'items': [
+        {'kind': 'tv', 'id': tv_id, 'state': 'Watching'} for tv_id in range(1, 4)
+    ]})
+    cursor = client.get('/api/tv-watchlist/watching/1?limit=1').get_json()['next_cursor']
+
+    assert client.get(f'/api/tv-watchlist/dropped/1?cursor={cursor}').status_code == 400
+    assert client.get('/api/tv-watchlist/watching/1?cursor=not-a-cursor').status_code == 400
+
+
+def test_state_reads_answer_if_none_match_with_304(app, client):
+    client.post('/api/set_movie_state', json={'user_id': 1, 'movie_id': 550, 'state': 'Watching'})
+    first = client.get('/api/get_movie_states/1')
+    etag = first.headers['ETag']
+
+    statements = []
+    listen = lambda conn, cursor, statement, *args: statements.append(statement)
+    sa.event.listen(db.engine, 'before_cursor_execute', listen)
+    try:
+        cached = client.get('/api/get_movie_states/1', headers={'If-None-Match': etag})
+    finally:
+        sa.event.remove(db.engine, 'before_cursor_execute', listen)
+
+    assert cached.status_code == 304
+    assert not any('movie_states' in statement for statement in statements)
+
+
+def test_state_writes_change_the_etag(client):
+    etag = client.get('/api/library/1').headers['ETag']
+
+    client.post('/api/set_tv_show_state', json={'user_id': 1, 'tv_show_id': 1399, 'state': 'Watching'})
+    after_write = client.get('/api/tv-watchlist/watching/1', headers={'If-None-Match': etag})
+    assert after_write.status_code == 200
+    assert after_write.headers['ETag'] != etag
+
+    etag = after_write.headers['ETag']
+    client.delete('/api/tv-watchlist/watching/1/1399')
+    assert client.get('/api/get_tv_show_states/1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_large_json_responses_are_gzipped(client):
+    client.post('/api/library/states', json={'user_id': 1, 'items': [
+        {'kind': 'movie', 'id': movie_id, 'state': 'Completed', 'title': f'Movie {movie_id}'} for movie_id in range(1, 60)
+    ]})
+
+    response = client.get('/api/library/1', headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data))['counts']['total'] == 59